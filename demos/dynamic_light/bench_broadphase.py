@@ -0,0 +1,68 @@
+"""
+Per light source cost of casting light among many boxes with small light sources: rays towards every vertex cast
+against every edge, against only the vertices and edges within each one's radius (near_edges' grid), for cast rays and
+for the angular sweep, checking that culling doesn't change the sweep's polygons.
+
+Run from this directory: python bench_broadphase.py [boxes] [lights]
+"""
+import sys
+
+import numpy as np
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource
+import lighting
+from bench_lighting import build_scene, timed
+
+def rays(origins, radius, vertices, cull):
+    return [lighting.light_rays([(x, y)], radius,
+                                lighting.vertices_within(vertices, x, y, radius) if cull else vertices,
+                                LightSource.quality_passes, LightSource.vertex_cast_multiplies)[0]
+            for x, y in origins]
+
+def cast(origins, radius, geometry, cull):
+    radii = [radius] * len(origins) if cull else None
+    return lighting.cast_light_rays(origins, rays(origins, radius, geometry.vertices, cull), geometry.edges, radii)
+
+def sweep(origins, radius, edges, cull):
+    if cull:
+        return lighting.visibility_polygons(origins, radius, edges, LightSource.quality_passes)
+    return [lighting.visibility_polygon(x, y, radius, edges, LightSource.quality_passes) for x, y in origins]
+
+def corners(polygon, tolerance=1e-6):
+    # The polygon without repeated points or points on a straight line between their neighbours, which only the edges
+    # a light source is given decide on.
+    polygon = polygon[np.hypot(*(polygon - np.roll(polygon, 1, axis=0)).T) > tolerance]
+    a, b = polygon - np.roll(polygon, 1, axis=0), np.roll(polygon, -1, axis=0) - polygon
+    return polygon[np.abs(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]) > tolerance * np.hypot(*a.T) * np.hypot(*b.T)]
+
+def same_polygons(first, second, tolerance=1e-6):
+    return all(len(a) == len(b) and np.allclose(a, b, atol=tolerance)
+               for a, b in zip(map(corners, first), map(corners, second)))
+
+def main(box_count=1000, light_count=50):
+    geometry, rng = build_scene(box_count)
+    edges = lighting.split_crossing_edges(geometry.edges)
+    origins = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(light_count)]
+    cast(origins[:1], 100, geometry, True)  # Compile the kernels.
+    sweep(origins[:1], 100, edges, True)
+
+    print(f"{box_count} boxes ({len(geometry.edges)} edges), {light_count} lights")
+    print(f"{'radius':>7} {'mode':>6} {'edges/light':>12} {'all ms/light':>13} {'culled ms/light':>16} {'speedup':>8}")
+    for radius in (50, 100, 200, LightSource.radius):
+        starts, _ = lighting.near_edges(origins, radius, geometry.edges)
+        near = (starts[-1] / light_count)
+        for mode, f, args in (('rays', cast, geometry), ('sweep', sweep, edges)):
+            every_result, every = timed(f, origins, radius, args, False, repeat=1)
+            culled_result, culled = timed(f, origins, radius, args, True)
+            # Rays towards vertices out of reach are dropped, which moves cast points along the radius, but the sweep
+            # is exact either way.
+            if mode == 'sweep':
+                assert same_polygons(every_result, culled_result), f"Culling changed sweep polygons at radius {radius}"
+            print(f"{radius:>7.0f} {mode:>6} {near:>12.1f} {every / light_count * 1000:>13.3f} "
+                  f"{culled / light_count * 1000:>16.3f} {every / culled:>7.1f}x")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
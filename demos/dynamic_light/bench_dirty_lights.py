@@ -0,0 +1,62 @@
+"""
+Light sources recomputed per frame while one box is dragged across the scene among 20 light sources: every light source
+invalidated on any box change (the old App.handle_light_entity_change) against only the ones that see the box.
+
+Run from this directory: python bench_dirty_lights.py [lights] [boxes]
+"""
+import statistics
+import sys
+import time
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource, Box
+from bench_lighting import build_scene
+
+def drag(light_count, box_count, dirty, frames=120, seed=0):
+    geometry, rng = build_scene(0, seed)
+    boxes = []
+    for _ in range(box_count):
+        boxes.append(Box(rng.uniform(0, WIDTH - 40), rng.uniform(0, HEIGHT - 40), 20, 20, geometry))
+    lights = [LightSource(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), (1, 1, 1, 0.5), geometry, False)
+              for _ in range(light_count)]
+    LightSource.cast_all(lights)
+    for b in boxes:
+        b.dirty_bounds = None
+
+    dragged = boxes[0]
+    dragged.y = HEIGHT / 2
+    counts, times = [], []
+    for frame in range(frames):
+        dragged.x = frame / frames * (WIDTH - dragged.w)
+        start = time.perf_counter()
+        for d in lights:
+            d.update(1 / 60)
+        for b in boxes:
+            b.update(1 / 60)
+            if b.dirty_bounds is not None:
+                if dirty:
+                    LightSource.invalidate(lights, *b.dirty_bounds)
+                else:
+                    for d in lights:
+                        d.force_rcp = True
+                b.dirty_bounds = None
+        counts.append(LightSource.cast_all(lights))
+        times.append(time.perf_counter() - start)
+    return counts, times
+
+def main(light_count=20, box_count=30):
+    drag(1, 1, True, frames=2)  # Compile the kernels.
+    print(f"Dragging one box across {box_count} boxes and {light_count} light sources")
+    print(f"{'radius':>7} {'invalidation':>13} {'mean rc/frame':>14} {'max rc/frame':>13} {'ms/frame':>9}")
+    for radius in (LightSource.radius, 200.0):
+        LightSource.radius = radius
+        for name, dirty in (('every light', False), ('dirty only', True)):
+            counts, times = drag(light_count, box_count, dirty)
+            print(f"{radius:>7.0f} {name:>13} {statistics.mean(counts):>14.1f} {max(counts):>13} "
+                  f"{statistics.mean(times) * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
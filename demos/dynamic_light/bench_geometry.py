@@ -0,0 +1,76 @@
+"""
+Boxes' edges and vertices kept in the shared Python lists (the old Box, removed with list.remove) against the Geometry
+arrays: adding then removing every box in random order, and turning the edges into the float64 array the lighting
+kernels take, as every frame with a recomputed light source does.
+
+Run from this directory: python bench_geometry.py [boxes...]
+"""
+import sys
+import time
+import random
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import lighting
+from geometry import Geometry
+
+class ListBox:
+    # The old Box's share of the parent lists.
+    def __init__(self, x, y, w, h, parent_vertices, parent_edges):
+        self.edges = [[(x, y), (x+w, y)], [(x, y), (x, y+h)], [(x+w, y), (x+w, y+h)], [(x, y+h), (x+w, y+h)]]
+        self.vertices = [[x, y], [x+w, y], [x, y+h], [x+w, y+h]]
+        self.parent_edges, self.parent_vertices = parent_edges, parent_vertices
+        parent_edges.extend(self.edges)
+        parent_vertices.extend(self.vertices)
+
+    def delete(self):
+        for e in self.edges:
+            self.parent_edges.remove(e)
+        for v in self.vertices:
+            self.parent_vertices.remove(v)
+
+def rects(count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.uniform(0, 1000), rng.uniform(0, 700), rng.uniform(8, 40), rng.uniform(8, 40)) for _ in range(count)]
+
+def lists(boxes, order):
+    vertices, edges = [], []
+    start = time.perf_counter()
+    owners = [ListBox(*rect, vertices, edges) for rect in boxes]
+    added = time.perf_counter()
+    for _ in range(10):
+        lighting.as_edge_array(edges)
+        lighting.as_vertex_array(vertices)
+    converted = time.perf_counter()
+    for i in order:
+        owners[i].delete()
+    return added - start, (converted - added) / 10, time.perf_counter() - converted
+
+def arrays(boxes, order):
+    geometry = Geometry()
+    start = time.perf_counter()
+    slots = []
+    for rect in boxes:
+        slots.append(geometry.add())
+        geometry.set_rect(slots[-1], *rect)
+    added = time.perf_counter()
+    for _ in range(10):
+        lighting.as_edge_array(geometry.edges)
+        lighting.as_vertex_array(geometry.vertices)
+    converted = time.perf_counter()
+    for i in order:
+        geometry.remove(slots[i])
+    return added - start, (converted - added) / 10, time.perf_counter() - converted
+
+def main(*box_counts):
+    print(f"{'boxes':>7} {'storage':>8} {'add ms':>8} {'to array ms':>12} {'remove ms':>10}")
+    for count in box_counts or (100, 1000, 5000):
+        boxes = rects(count)
+        order = random.Random(1).sample(range(count), count)
+        for name, f in (('lists', lists), ('arrays', arrays)):
+            add, convert, remove = f(boxes, order)
+            print(f"{count:>7} {name:>8} {add * 1000:>8.2f} {convert * 1000:>12.3f} {remove * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,82 @@
+"""
+Frame time of drawing the light polygons of many light sources: one glColor4f and glVertex2f per vertex (the old
+LightSource.draw) against one cached vertex list per light source. Polygons are cast once, as they are when nothing
+moves, so only drawing is measured. CPU time is measured separately from the frame time, which includes filling the
+polygons' pixels.
+
+Run from this directory: python bench_light_draw.py [boxes] [--headless]
+"""
+import math
+import random
+import sys
+import time
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+from pyglet.gl import * # pylint: disable=W0614
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource
+from bench_lighting import build_scene
+
+def draw_immediate(d):
+    # The old LightSource.draw, with set_light_color inlined.
+    r, g, b, a = d.light_color
+    def vertex(x, y):
+        s = min(1, 1 - (1 - d.strength_over) * math.hypot(x, y) / d.radius)
+        glColor4f(r, g, b, a * s)
+        glVertex2f(d.x + x, d.y + y)
+    glBegin(GL_TRIANGLE_FAN)
+    glColor4f(*d.light_color)
+    glVertex2f(d.x, d.y)
+    for (x1, y1), (x2, y2) in zip(d.raycasts, d.raycasts[1:]):
+        vertex(x1, y1)
+        vertex(x2, y2)
+    vertex(*d.raycasts[0])
+    glEnd()
+
+def draw_vertex_list(d):
+    d.draw()
+
+def frame_time(window, lights, draw, frames):
+    for d in lights:
+        draw(d)  # Warm up, so vertex lists are made before timing.
+    cpu = total = 0
+    for _ in range(frames):
+        window.switch_to()
+        glClear(GL_COLOR_BUFFER_BIT)
+        start = time.perf_counter()
+        for d in lights:
+            draw(d)
+        cpu += time.perf_counter() - start
+        glFinish()
+        total += time.perf_counter() - start
+        window.flip()
+    return cpu / frames, total / frames
+
+def main(box_count=20, light_counts=(1, 10, 50), frames=30):
+    window = pyglet.window.Window(WIDTH, HEIGHT, visible=False)
+    window.on_resize(WIDTH, HEIGHT)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+    geometry, rng = build_scene(box_count)
+
+    print(f"{gl_info.get_renderer()}, {WIDTH}x{HEIGHT}, {box_count} boxes, {frames} frames per measurement")
+    print(f"{'lights':>7} {'glVertex calls':>15} {'glVertex cpu ms':>16} {'frame ms':>9} "
+          f"{'vertex list cpu ms':>19} {'frame ms':>9}")
+    for count in light_counts:
+        lights = [LightSource(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), (1, 1, 0, 0.1), geometry, False)
+                  for _ in range(count)]
+        LightSource.cast_all(lights)
+        immediate = frame_time(window, lights, draw_immediate, frames)
+        listed = frame_time(window, lights, draw_vertex_list, frames)
+        print(f"{count:>7} {sum(2 * len(d.raycasts) + 1 for d in lights):>15} "
+              f"{immediate[0] * 1000:>16.2f} {immediate[1] * 1000:>9.2f} "
+              f"{listed[0] * 1000:>19.2f} {listed[1] * 1000:>9.2f}")
+        for d in lights:
+            d.delete()
+    window.close()
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:] if not arg.startswith('--')])
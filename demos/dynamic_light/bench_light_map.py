@@ -0,0 +1,66 @@
+"""
+Frame time of the dynamic light demo at each light map scale, with light sources whose radius covers the whole scene and
+with small ones, so that the light map only covers part of it. GPU time is measured with GL timer queries, CPU time as
+the time spent issuing the frame.
+
+Run from this directory: python bench_light_map.py [lights] [boxes] [--headless]
+"""
+import ctypes
+import random
+import sys
+import time
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+from pyglet.gl import * # pylint: disable=W0614
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource
+import main as demo
+
+def frame_times(app, frames):
+    query = GLuint()
+    glGenQueries(1, ctypes.byref(query))
+    app.on_draw()  # Warm up, so the light polygons are cast before timing.
+    glFinish()
+    cpu = gpu = 0
+    for _ in range(frames):
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        start = time.perf_counter()
+        app.on_draw()
+        cpu += time.perf_counter() - start
+        glEndQuery(GL_TIME_ELAPSED)
+        elapsed = GLuint64()
+        glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+        gpu += elapsed.value / 1e9
+        app.flip()
+    glDeleteQueries(1, ctypes.byref(query))
+    return cpu / frames, gpu / frames
+
+def main(light_count=10, box_count=20, frames=30):
+    app = demo.App()
+    app.on_resize(WIDTH, HEIGHT)
+    rng = random.Random(0)
+    for _ in range(box_count):
+        app.add_box(rng.uniform(0, WIDTH - 100), rng.uniform(0, HEIGHT - 100))
+    for _ in range(light_count):
+        app.add_light_source(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+
+    print(f"{gl_info.get_renderer()}, {WIDTH}x{HEIGHT}, {len(app.light_sources)} lights, {box_count} boxes, "
+          f"{frames} frames per measurement")
+    print(f"{'radius':>7} {'scale':>6} {'light map':>10} {'coverage':>9} {'cpu ms':>7} {'gpu ms':>7}")
+    for radius in (LightSource.radius, 120.0):
+        LightSource.radius = radius
+        for d in app.light_sources:
+            d.force_rcp = True
+        for scale in (1, 1/2, 1/4):
+            app.light_map.set_scale(scale)
+            cpu, gpu = frame_times(app, frames)
+            print(f"{radius:>7.0f} {scale:>6.2f} {f'{app.light_map.map_width}x{app.light_map.map_height}':>10} "
+                  f"{app.light_map.coverage:>9.0%} {cpu * 1000:>7.2f} {gpu * 1000:>7.2f}")
+    app.light_map.delete()
+    app.close()
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:] if not arg.startswith('--')])
@@ -0,0 +1,64 @@
+"""
+Light polygons of 16 light sources recomputed every frame: cast_all on the render thread against a LightWorkers pool
+with more and more threads. Throughput is the time to get every polygon of a frame (waiting for the workers), render
+thread time what a frame of the demo spends on them when it only takes the polygons that are ready.
+
+Run from this directory: python bench_light_workers.py [lights] [boxes]
+"""
+import os
+import sys
+import time
+import statistics
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource
+from light_workers import LightWorkers
+from bench_lighting import build_scene
+
+def frame_times(lights, workers, wait, frames):
+    times = []
+    for _ in range(frames):
+        for d in lights:
+            d.force_rcp = True
+        start = time.perf_counter()
+        if workers is None:
+            LightSource.cast_all(lights)
+        else:
+            LightSource.cast_all(lights, workers)
+            if wait:
+                workers.collect(wait=True)
+        times.append(time.perf_counter() - start)
+        if workers is not None and not wait:
+            time.sleep(max(0, 1 / 60 - times[-1]))  # The rest of the frame.
+    if workers is not None:
+        workers.collect(wait=True)
+    return statistics.mean(times)
+
+def main(light_count=16, box_count=200, frames=30):
+    geometry, rng = build_scene(box_count)
+    lights = [LightSource(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), (1, 1, 1, 0.5), geometry, False)
+              for _ in range(light_count)]
+    thread_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    print(f"{light_count} lights, {box_count} boxes ({len(geometry.edges)} edges), {os.cpu_count()} cpus, "
+          f"{frames} frames per measurement")
+    print(f"{'mode':>6} {'threads':>8} {'throughput ms':>14} {'speedup':>8} {'render thread ms':>17}")
+    for sweep in (0, 1):
+        LightSource.sweep = sweep
+        mode = 'sweep' if sweep else 'rays'
+        LightSource.cast_all(lights)  # Compile the kernels.
+        serial = frame_times(lights, None, True, frames)
+        print(f"{mode:>6} {'-':>8} {serial * 1000:>14.2f} {1:>7.2f}x {serial * 1000:>17.2f}")
+        for threads in thread_counts:
+            workers = LightWorkers(threads)
+            throughput = frame_times(lights, workers, True, frames)
+            render = frame_times(lights, workers, False, frames)
+            workers.shutdown()
+            print(f"{mode:>6} {threads:>8} {throughput * 1000:>14.2f} {serial / throughput:>7.2f}x "
+                  f"{render * 1000:>17.2f}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
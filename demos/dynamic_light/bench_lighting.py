@@ -0,0 +1,109 @@
+"""
+Light polygons of many light sources among many boxes: get_light_raycasts once per light source against the batched
+light_polygons, checking that both cast the same rays to the same points, and the angular sweep (visibility_polygon)
+against light_polygons as the number of boxes grows, comparing the areas they light and checking that the sweep's
+polygons stay within the radius.
+
+Run from this directory: python bench_lighting.py [boxes]
+"""
+import math
+import random
+import sys
+import time
+
+import pyglet
+pyglet.options['shadow_window'] = False
+import numpy as np
+
+from constants import WIDTH, HEIGHT
+from entities import LightSource, Box
+from geometry import Geometry
+import lighting
+
+def build_scene(box_count, seed=0):
+    rng = random.Random(seed)
+    g = 3
+    geometry = Geometry()
+    geometry.set_rect(geometry.add(), g, g, WIDTH - 2*g, HEIGHT - 2*g)
+    for _ in range(box_count):
+        w, h = rng.uniform(8, 40), rng.uniform(8, 40)
+        Box(rng.uniform(g, WIDTH - g - w), rng.uniform(g, HEIGHT - g - h), w, h, geometry)
+    return geometry, rng
+
+def scalar_polygons(origins, vertices, edges):
+    return [lighting.get_light_raycasts(x, y, LightSource.quality_passes, LightSource.vertex_cast_multiplies,
+                                        LightSource.fallback_passes, LightSource.radius, vertices, edges)[0]
+            for x, y in origins]
+
+def batched_polygons(origins, vertices, edges):
+    return lighting.light_polygons(origins, LightSource.radius, vertices, edges,
+                                   LightSource.quality_passes, LightSource.vertex_cast_multiplies)
+
+def sweep_polygons(origins, edges):
+    edges = lighting.split_crossing_edges(edges)
+    return [lighting.visibility_polygon(x, y, LightSource.radius, edges, LightSource.quality_passes)
+            for x, y in origins]
+
+def area(polygon):
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+def timed(f, *args, repeat=3):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def compare(scalar, batched, tolerance=1e-3):
+    # Fraction of rays ending within tolerance of each other, and how far apart the rest are.
+    matched = total = 0
+    worst = 0.0
+    for a, b in zip(scalar, batched):
+        d = np.hypot(*(np.asarray(a) - b).T)
+        matched += np.count_nonzero(d <= tolerance)
+        total += len(d)
+        worst = max(worst, d.max())
+    return matched / total, worst
+
+def compare_sweep(box_counts, light_count=10):
+    print(f"{light_count} lights")
+    print(f"{'boxes':>7} {'edges':>6} {'batched ms':>11} {'sweep ms':>9} {'speedup':>8} {'lit area':>9}")
+    for box_count in box_counts:
+        geometry, rng = build_scene(box_count)
+        vertices, edges = geometry.vertices, geometry.edges
+        origins = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(light_count)]
+        batched, batched_time = timed(batched_polygons, origins, vertices, edges)
+        swept, sweep_time = timed(sweep_polygons, origins, edges)
+        # Up to the rounding of the bound polygon's corners.
+        beyond = max(np.hypot(*polygon.T).max() for polygon in swept) / LightSource.radius - 1
+        assert beyond <= 1e-9, f"A sweep polygon reaches {beyond:.2%} beyond the radius"
+        # The rays cut the corners of shadows, so they light a little less than the exact polygon.
+        lit = sum(map(area, batched)) / sum(map(area, swept))
+        print(f"{box_count:>7} {len(edges):>6} {batched_time * 1000:>11.1f} {sweep_time * 1000:>9.1f} "
+              f"{batched_time / sweep_time:>7.1f}x {lit:>9.2%}")
+
+def main(box_count=100, light_counts=(1, 10, 50)):
+    geometry, rng = build_scene(box_count)
+    vertices, edges = geometry.vertices, geometry.edges
+    batched_polygons([(WIDTH / 2, HEIGHT / 2)], vertices, edges)  # Compile the kernels.
+    sweep_polygons([(WIDTH / 2, HEIGHT / 2)], edges)
+    scalar_polygons([(WIDTH / 2, HEIGHT / 2)], vertices, edges)
+
+    print(f"{box_count} boxes ({len(edges)} edges), "
+          f"{len(vertices) * (2 * LightSource.vertex_cast_multiplies + 1) + LightSource.quality_passes + 1} "
+          f"rays per light")
+    print(f"{'lights':>7} {'scalar ms':>10} {'batched ms':>11} {'speedup':>8} {'rays matched':>13} {'worst px':>9}")
+    for count in light_counts:
+        origins = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(count)]
+        scalar, scalar_time = timed(scalar_polygons, origins, vertices, edges, repeat=1)
+        batched, batched_time = timed(batched_polygons, origins, vertices, edges)
+        matched, worst = compare(scalar, batched)
+        print(f"{count:>7} {scalar_time * 1000:>10.1f} {batched_time * 1000:>11.1f} "
+              f"{scalar_time / batched_time:>7.1f}x {matched:>12.2%} {worst:>9.3f}")
+    print()
+    compare_sweep((box_count, 300, 1000))
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
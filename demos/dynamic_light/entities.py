@@ -1,13 +1,10 @@
 import math
 
-from numba import jit, void, float64
+import pyglet
 from pyglet.gl import * # pylint: disable=W0614
 
 from constants import WIDTH, HEIGHT
-from gl_utilities import (
-    glTriangleFanContext, glTrianglesContext,
-    glLinesContext, draw_polygon
-)
+from gl_utilities import glLinesContext, draw_polygon
 import lighting
 
 class LightSource:
@@ -21,17 +18,23 @@ class LightSource:
     draw_raycasts = 0
     draw_all_raycasts = 0
     draw_raycast_lines = 0
+    # Exact polygons by an angular sweep over the edges' endpoints, instead of casting rays
+    sweep = 0
     rcp_delay = 900
-    def __init__(self, x, y, light_color, vertices, edges, rects, auto_rcp=True):
+    def __init__(self, x, y, light_color, geometry, auto_rcp=True):
         self.x, self.y = float(x), float(y)
         self.ticks = 0
         self.bg_color = (0, 0, 0, 0)
         self.light_color = light_color
-        self.vertices = vertices
-        self.edges = edges
-        #RCP - RayCast Preprocessing
+        self.geometry = geometry
+        #RCP - RayCast Preprocessing, here the ray vectors cast from the light source
         self.raycasts, self.all_raycasts = [], []
-        self.vertices_rcp, self.edges_rcp = lighting.raycast_preprocessing(**self.rpc_kwargs)
+        self.polygon = None
+        self.rays = None
+        # Triangle fan of the polygon, redone when the polygon changes
+        self.vertex_list = None
+        self.drawn_polygon = None
+        self.refresh_rcp()
         self.rcp_update = self.rcp_delay
         self.force_rcp = True
         self.updated_rcp = True
@@ -42,64 +45,93 @@ class LightSource:
         if self.rcp_update > 0:
             self.rcp_update -= 1
     
+    def refresh_rcp(self):
+        # Vertices out of reach cast no shadow inside the radius, so they get no rays.
+        vertices = lighting.vertices_within(self.geometry.vertices, self.x, self.y, self.radius)
+        self.rays = lighting.light_rays([(self.x, self.y)], self.radius, vertices,
+                                        self.quality_passes, self.vertex_cast_multiplies)[0]
+
     @property
-    def rpc_kwargs(self):
-        return dict(
-            mx=self.x, my=self.y,
-            quality_passes=self.quality_passes,
-            vertex_cast_multiplies=self.vertex_cast_multiplies,
-            fallback_passes = self.fallback_passes,
-            radius=self.radius,
-            vertices=self.vertices,
-            edges=self.edges
-        )
+    def needs_rcp(self):
+        return self.auto_rcp or self.rcp_update <= 0 or self.force_rcp
 
     @property
-    def raycast_kwargs(self):
-        return dict(
-            mx=self.x, my=self.y,
-            quality_passes=self.quality_passes,
-            vertex_cast_multiplies=self.vertex_cast_multiplies,
-            fallback_passes = self.fallback_passes,
-            radius=self.radius,
-            vertices=self.vertices if self.auto_rcp else self.vertices_rcp,
-            edges=self.edges if self.auto_rcp else self.edges_rcp,
-            auto_preprocessing=self.auto_rcp,
-            collect_all_raycasts=False
-        )
-
-    @staticmethod    
-    @jit(void(float64, float64, float64, float64, float64, float64, float64, float64))
-    def set_light_color(x, y, c_strength, radius, r, g, b, a):
-        d = math.hypot(x, y)
-        s = min(1, 1 - (1 - c_strength) * d/radius)
-        glColor4f(r, g, b, a * s)
+    def needs_raycasts(self):
+        return self.updated_rcp or self.auto_rcp
+
+    def sees(self, x, y, w, h):
+        # Whether the rectangle is within the radius and touches the last polygon, i.e. whether changing the edges in it
+        # can change what this light source sees.
+        dx = max(x - self.x, 0, self.x - x - w)
+        dy = max(y - self.y, 0, self.y - y - h)
+        if math.hypot(dx, dy) > self.radius:
+            return False
+        return self.polygon is None or lighting.polygon_intersects_rect(self.polygon, x - self.x, y - self.y, w, h)
+
+    @staticmethod
+    def invalidate(light_sources, x, y, w, h):
+        # Edges in the rectangle changed, so the light sources that see it have to recompute.
+        for d in light_sources:
+            if not d.force_rcp and d.sees(x, y, w, h):
+                d.force_rcp = True
+
+    @staticmethod
+    def cast_all(light_sources, workers=None):
+        # Raycasts of every light source that needs them, in one batched call, or handed to a LightWorkers pool, in
+        # which case the ones it hasn't finished keep their last polygon. Returns how many were recomputed.
+        for d in light_sources:
+            if d.needs_rcp:
+                d.refresh_rcp()
+                d.rcp_update = d.rcp_delay
+                d.updated_rcp = True
+                d.force_rcp = False
+        pending = [d for d in light_sources if d.needs_raycasts]
+        if workers is not None:
+            if pending:
+                workers.submit(pending, pending[0].geometry)
+            return workers.collect()
+        if not pending:
+            return 0
+        casting = [d for d in pending if not d.sweep]
+        polygons = lighting.cast_light_rays([(d.x, d.y) for d in casting], [d.rays for d in casting],
+                                            pending[0].geometry.edges, [d.radius for d in casting])
+        sweeping = [d for d in pending if d.sweep]
+        if sweeping:
+            edges = pending[0].geometry.split_edges()
+            polygons += lighting.visibility_polygons([(d.x, d.y) for d in sweeping], [d.radius for d in sweeping],
+                                                     edges, sweeping[0].quality_passes)
+        for d, polygon in zip(casting + sweeping, polygons):
+            d.polygon = polygon
+            d.raycasts = polygon.tolist()
+            d.updated_rcp = False
+        return len(pending)
+
+    def update_vertex_list(self):
+        vertices, colors = lighting.light_fan(self.x, self.y, self.polygon, self.light_color,
+                                              self.strength_over, self.radius)
+        count = len(vertices) // 2
+        if self.vertex_list is None:
+            self.vertex_list = pyglet.graphics.vertex_list(count, 'v2f/stream', 'c4f/stream')
+        elif self.vertex_list.get_size() != count:
+            self.vertex_list.resize(count)
+        self.vertex_list.vertices[:] = vertices
+        self.vertex_list.colors[:] = colors
+        self.drawn_polygon = self.polygon
 
     def draw(self):
         # Sinusoidal-wave based ligth strength
         #c_strength = 1 - (math.sin((self.ticks % 100) / 100 * math.tau) + 1)/2
-        # Raycasts are calculated here to make sure they are updated
+        # Raycasts are calculated right before drawing, by cast_all, to make sure they are updated
         # .draw() happens on every screen refresh and .update() every 1/60th of a second
-        if (not self.auto_rcp and self.rcp_update <= 0) or self.force_rcp:
-            self.vertices_rcp, self.edges_rcp = lighting.raycast_preprocessing(**self.rpc_kwargs)
-            self.rcp_update = self.rcp_delay
-            self.updated_rcp = True
-            self.force_rcp = False
-        if self.updated_rcp or self.auto_rcp:
-            self.raycasts, self.all_raycasts = lighting.get_light_raycasts(**self.raycast_kwargs)  # pylint: disable=W0612
-            self.update_rcp = False
-        c_strength = self.strength_over 
-        with glTriangleFanContext(self.x, self.y, enclose=True) as fan:
-            glColor4f(*self.light_color)
-            fan.Vertex2(0, 0)
-            r, g, b, a = self.light_color
-            for (x1, y1), (x2, y2) in zip(self.raycasts, self.raycasts[1:]):
-                self.set_light_color(x1, y1, c_strength, self.radius, r, g, b, a)
-                glVertex2f(self.x + x1, self.y + y1)
-                self.set_light_color(x2, y2, c_strength, self.radius, r, g, b, a)
-                glVertex2f(self.x + x2, self.y + y2)
-            self.set_light_color(self.raycasts[0][0], self.raycasts[0][1], c_strength, self.radius, r, g, b, a)
-            glVertex2f(self.x + self.raycasts[0][0], self.y + self.raycasts[0][1])
+        if self.draw_all_raycasts:
+            # Only the scalar raycaster collects every intersection.
+            self.all_raycasts = lighting.get_light_raycasts(
+                self.x, self.y, self.quality_passes, self.vertex_cast_multiplies, self.fallback_passes,
+                self.radius, self.geometry.vertices, self.geometry.edges, collect_all_raycasts=True
+            )[1]
+        if self.polygon is not self.drawn_polygon:
+            self.update_vertex_list()
+        self.vertex_list.draw(GL_TRIANGLE_FAN)
 
         if self.draw_all_raycasts:
             for px, py in self.all_raycasts:
@@ -115,32 +147,28 @@ class LightSource:
                     lines.Vertex2(px, py)
     
     def delete(self):
-        pass
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
 
 class Box:
     color = (1, 1, 1, 1)
-    def __init__(self, x, y, w, h, parent_vertices, parent_edges, parent_rects):
+    def __init__(self, x, y, w, h, geometry):
         self.x, self.y, self.w, self.h = x, y, w, h
-        self.edges = [[(0, 0), (0, 0)] for _ in range(4)]
-        self.redo_edges()
-        self.parent_edges = parent_edges
-        self.parent_edges.extend(self.edges)
-        self.vertices = [[0, 0] for _ in range(4)]
-        self.redo_vertices()
-        self.parent_vertices = parent_vertices
-        self.parent_vertices.extend(self.vertices)
-        self.rect = [self.vertices[0], self.vertices[3]]
-        self.parent_rects = parent_rects
-        self.parent_rects.append(self.rect)
+        # Edges and vertices are kept in the geometry shared with the light sources
+        self.geometry = geometry
+        self.slot = geometry.add()
+        self.redo_geometry()
         self.lx, self.ly, self.lw, self.lh = x, y, w, h
+        # Rectangle around where the edges were and are since they last changed, until the light sources are told
+        self.dirty_bounds = self.bounds
 
-    def draw(self):
-        glColor4f(*self.color)
-        with glTrianglesContext(self.x, self.y) as tri:
+    def add_to_shape(self, shape):
+        shape.Color4(*self.color)
+        with shape.Triangles(self.x, self.y) as tri:
             tri.Vertex2(0, 0)
             tri.Vertex2(self.w, 0)
             tri.Vertex2(self.w, self.h)
-        with glTrianglesContext(self.x, self.y) as tri:
             tri.Vertex2(0, 0)
             tri.Vertex2(self.w, self.h)
             tri.Vertex2(0, self.h)
@@ -148,38 +176,29 @@ class Box:
     def update(self, delta):
         if self.lx != self.x or self.ly != self.y or \
            self.lw != self.w or self.lh != self.h:
-            self.redo_edges()
-            self.redo_vertices()
+            self.redo_geometry()
+            self.mark_dirty(self.lx, self.ly, self.lw, self.lh)
+            self.mark_dirty(*self.bounds)
             self.lx, self.ly, self.lw, self.lh = self.x, self.y, self.w, self.h
 
-    def redo_edges(self):
-        x, y, w, h = self.x, self.y, self.w, self.h
-        self.edges[0][0] = (x, y)
-        self.edges[0][1] = (x+w, y)
-        self.edges[1][0] = (x, y)
-        self.edges[1][1] = (x, y+h)
-        self.edges[2][0] = (x+w, y)
-        self.edges[2][1] = (x+w, y+h)
-        self.edges[3][0] = (x, y+h)
-        self.edges[3][1] = (x+w, y+h)
-    
-    def redo_vertices(self):
-        x, y, w, h = self.x, self.y, self.w, self.h
-        self.vertices[0][0] = x
-        self.vertices[0][1] = y
-        self.vertices[1][0] = x+w
-        self.vertices[1][1] = y
-        self.vertices[2][0] = x
-        self.vertices[2][1] = y+h
-        self.vertices[3][0] = x+w
-        self.vertices[3][1] = y+h
+    @property
+    def bounds(self):
+        return self.x, self.y, self.w, self.h
+
+    def mark_dirty(self, x, y, w, h):
+        if self.dirty_bounds is None:
+            self.dirty_bounds = (x, y, w, h)
+        else:
+            dx, dy, dw, dh = self.dirty_bounds
+            x1, y1 = min(x, dx), min(y, dy)
+            x2, y2 = max(x + w, dx + dw), max(y + h, dy + dh)
+            self.dirty_bounds = (x1, y1, x2 - x1, y2 - y1)
+
+    def redo_geometry(self):
+        self.geometry.set_rect(self.slot, self.x, self.y, self.w, self.h)
 
     def delete(self):
-        for e in self.edges:
-            self.parent_edges.remove(e)
-        for v in self.vertices:
-            self.parent_vertices.remove(v)
-        self.parent_rects.remove(self.rect)
+        self.geometry.remove(self.slot)
 
 class BoxSizeDrag:
     def __init__(self, parent, sx, sy):
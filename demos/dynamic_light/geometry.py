@@ -0,0 +1,76 @@
+import numpy as np
+
+import lighting
+
+class Slot:
+    # Handle to where an owner's edges and vertices are, kept up to date as slots move
+    __slots__ = ('index',)
+    def __init__(self, index):
+        self.index = index
+
+class Geometry:
+    # Edges and vertices light is cast against, in float64 arrays the lighting code reads as they are: edges as rows of
+    # x1, y1, x2, y2, vertices as rows of x, y. Each owner (a box, or the scene's border) has a slot of 4 edges and 4
+    # vertices. Slots are packed at the front of the arrays, and removing one moves the last slot into its place, so
+    # adding and removing are O(1), growing the arrays aside. version counts the changes, so that what is computed from
+    # the edges can be kept until they change.
+    slot_edges = slot_vertices = 4
+    def __init__(self, capacity=16):
+        self._edges = np.zeros((capacity * self.slot_edges, 4))
+        self._vertices = np.zeros((capacity * self.slot_vertices, 2))
+        self.slots = []
+        self.version = 0
+        self._split_edges = self._split_version = None
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def edges(self):
+        return self._edges[:len(self.slots) * self.slot_edges]
+
+    @property
+    def vertices(self):
+        return self._vertices[:len(self.slots) * self.slot_vertices]
+
+    def split_edges(self):
+        # The edges split where they cross, for the angular sweep. Recomputed only once the edges have changed, and
+        # never changed in place, so it can be handed to other threads as it is.
+        if self._split_version != self.version:
+            self._split_edges = lighting.split_crossing_edges(self.edges.copy())
+            self._split_version = self.version
+        return self._split_edges
+
+    def add(self):
+        if len(self.slots) * self.slot_edges == len(self._edges):
+            self._edges = np.concatenate((self._edges, np.zeros_like(self._edges)))
+            self._vertices = np.concatenate((self._vertices, np.zeros_like(self._vertices)))
+        slot = Slot(len(self.slots))
+        self.slots.append(slot)
+        self.version += 1
+        return slot
+
+    def remove(self, slot):
+        self.version += 1
+        last = self.slots.pop()
+        if last is not slot:
+            e, v = self.slot_edges, self.slot_vertices
+            self._edges[slot.index * e:(slot.index + 1) * e] = self._edges[last.index * e:(last.index + 1) * e]
+            self._vertices[slot.index * v:(slot.index + 1) * v] = \
+                self._vertices[last.index * v:(last.index + 1) * v]
+            last.index = slot.index
+            self.slots[slot.index] = last
+        slot.index = None
+
+    def set_rect(self, slot, x, y, w, h):
+        # The sides and corners of a rectangle, in the order boxes always had them.
+        self.version += 1
+        i = slot.index * self.slot_edges
+        self._edges[i:i + 4] = (
+            (x, y, x+w, y),
+            (x, y, x, y+h),
+            (x+w, y, x+w, y+h),
+            (x, y+h, x+w, y+h)
+        )
+        i = slot.index * self.slot_vertices
+        self._vertices[i:i + 4] = ((x, y), (x+w, y), (x, y+h), (x+w, y+h))
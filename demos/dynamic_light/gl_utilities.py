@@ -1,5 +1,6 @@
 import math
 
+import pyglet
 from pyglet.gl import * # pylint: disable=W0614
 
 def glContextFactory(state):
@@ -40,4 +41,93 @@ def draw_polygon(x, y, r, p, c):
         glColor4f(*c)
         for i in range(p):
             a = (i/p) * math.tau
-            fan.Vertex2(math.cos(a)*r, math.sin(a)*r)
\ No newline at end of file
+            fan.Vertex2(math.cos(a)*r, math.sin(a)*r)
+
+# Retained mode: the same contexts, but the vertices are collected into a shape's vertex lists instead of being drawn,
+# so geometry that doesn't change between frames is built once and drawn with a single batch.
+
+def retainedContextFactory(state):
+    class RetainedContext:
+        def __init__(self, shape, mx=0, my=0, *, enclose=False):
+            self.shape = shape
+            self.mx, self.my = mx, my
+            self.enclose = enclose
+            self.coords, self.colors = [], []
+
+        def __enter__(self, *args):
+            return self
+
+        def Vertex2(self, x, y):
+            self.coords += (x + self.mx, y + self.my)
+            self.colors += self.shape.color
+
+        def __exit__(self, *args):
+            if self.enclose and len(self.coords) >= 4 and state == GL_TRIANGLE_FAN:
+                self.coords += self.coords[2:4]
+                self.colors += self.colors[4:8]
+            self.shape.add(state, self.coords, self.colors)
+    return RetainedContext
+
+class RetainedShape:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.vertex_lists = []
+        self.parameters = self.unbuilt = object()
+        self.color = (1, 1, 1, 1)
+
+    def rebuild(self, *parameters):
+        # Whether the shape has to be built again for these parameters. If so, it is emptied first.
+        if parameters == self.parameters:
+            return False
+        for vertex_list in self.vertex_lists:
+            vertex_list.delete()
+        self.vertex_lists = []
+        self.parameters = parameters
+        self.color = (1, 1, 1, 1)
+        return True
+
+    def invalidate(self):
+        self.parameters = self.unbuilt
+
+    def Color4(self, r, g, b, a=1):
+        self.color = (r, g, b, a)
+
+    def TriangleFan(self, mx=0, my=0, *, enclose=False):
+        return RetainedTriangleFanContext(self, mx, my, enclose=enclose)
+
+    def Triangles(self, mx=0, my=0):
+        return RetainedTrianglesContext(self, mx, my)
+
+    def Lines(self, mx=0, my=0):
+        return RetainedLinesContext(self, mx, my)
+
+    def Quad(self, mx=0, my=0):
+        return RetainedQuadContext(self, mx, my)
+
+    def add(self, state, coords, colors):
+        count = len(coords) // 2
+        if not count:
+            return
+        if state == GL_TRIANGLE_FAN:
+            # Fans can't share a batch's draw call, so they're split into triangles.
+            indices = [i for k in range(1, count - 1) for i in (0, k, k + 1)]
+            vertex_list = self.batch.add_indexed(count, GL_TRIANGLES, None, indices,
+                                                 ('v2f/static', coords), ('c4f/static', colors))
+        else:
+            vertex_list = self.batch.add(count, state, None, ('v2f/static', coords), ('c4f/static', colors))
+        self.vertex_lists.append(vertex_list)
+
+    def draw(self):
+        self.batch.draw()
+
+RetainedTriangleFanContext = retainedContextFactory(GL_TRIANGLE_FAN)
+RetainedTrianglesContext = retainedContextFactory(GL_TRIANGLES)
+RetainedLinesContext = retainedContextFactory(GL_LINES)
+RetainedQuadContext = retainedContextFactory(GL_QUADS)
+
+def add_polygon(shape, x, y, r, p, c):
+    shape.Color4(*c)
+    with shape.TriangleFan(x, y, enclose=True) as fan:
+        for i in range(p):
+            a = (i/p) * math.tau
+            fan.Vertex2(math.cos(a)*r, math.sin(a)*r)
@@ -0,0 +1,114 @@
+import ctypes
+import math
+
+import numpy as np
+import pyglet
+from pyglet.gl import * # pylint: disable=W0614
+
+class LightMap:
+    # Light accumulated into a texture at a fraction of the scene's resolution, upscaled with linear filtering when it is
+    # multiplied onto the scene. The scene is split into square tiles, and tiles no light source's radius reaches are
+    # neither cleared nor sampled: they are multiplied by the flat ambient colour instead.
+    tile_size = 64
+
+    def __init__(self, width, height, scale=1.0):
+        self.width, self.height = width, height
+        self.cols, self.rows = math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+        self.texture, self.fbo = GLuint(), GLuint()
+        glGenTextures(1, ctypes.byref(self.texture))
+        glGenFramebuffers(1, ctypes.byref(self.fbo))
+        self.lit_spans, self.dark_spans = [], []
+        self._viewport = (GLint * 4)()
+        self.set_scale(scale)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.map_width, self.map_height = max(1, round(self.width * scale)), max(1, round(self.height * scale))
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, self.map_width, self.map_height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture, 0)
+        assert glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def covered_tiles(self, light_sources):
+        # Tiles within the radius of some light source, shape (rows, cols)
+        covered = np.zeros((self.rows, self.cols), dtype=bool)
+        if not light_sources:
+            return covered
+        x1 = np.arange(self.cols) * self.tile_size
+        y1 = np.arange(self.rows) * self.tile_size
+        for d in light_sources:
+            dx = np.maximum(np.maximum(x1 - d.x, 0), d.x - x1 - self.tile_size)
+            dy = np.maximum(np.maximum(y1 - d.y, 0), d.y - y1 - self.tile_size)
+            covered |= np.hypot(dx[None, :], dy[:, None]) <= d.radius
+        return covered
+
+    def spans(self, tiles):
+        # Runs of tiles along each row as rectangles in scene coordinates
+        spans = []
+        t = self.tile_size
+        for row, line in enumerate(tiles):
+            edges = np.flatnonzero(np.diff(np.concatenate(([False], line, [False]))))
+            for start, end in zip(edges[::2], edges[1::2]):
+                x, y = start * t, row * t
+                spans.append((x, y, min(end * t, self.width) - x, min(y + t, self.height) - y))
+        return spans
+
+    def begin(self, light_sources):
+        # Start drawing light in scene coordinates, with the lit tiles cleared to black.
+        covered = self.covered_tiles(light_sources)
+        self.lit_spans, self.dark_spans = self.spans(covered), self.spans(~covered)
+        glGetIntegerv(GL_VIEWPORT, self._viewport)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.map_width, self.map_height)
+        glClearColor(0, 0, 0, 1)
+        glEnable(GL_SCISSOR_TEST)
+        for x, y, w, h in self.lit_spans:
+            # One texel wider on every side, as linear filtering at a span's edge also samples the texels just outside
+            # it, which belong to dark tiles and are otherwise never cleared.
+            x1, y1 = max(math.floor(x * self.scale) - 1, 0), max(math.floor(y * self.scale) - 1, 0)
+            x2 = min(math.ceil((x + w) * self.scale) + 1, self.map_width)
+            y2 = min(math.ceil((y + h) * self.scale) + 1, self.map_height)
+            glScissor(x1, y1, x2 - x1, y2 - y1)
+            glClear(GL_COLOR_BUFFER_BIT)
+        glDisable(GL_SCISSOR_TEST)
+
+    def end(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(*self._viewport)
+
+    def render(self, ambient=(0, 0, 0)):
+        # Multiply the scene by the light, with the blend function left to the caller.
+        if self.lit_spans:
+            vertices, tex_coords = [], []
+            for x, y, w, h in self.lit_spans:
+                vertices += (x, y, x + w, y, x + w, y + h, x, y + h)
+                u1, v1, u2, v2 = x / self.width, y / self.height, (x + w) / self.width, (y + h) / self.height
+                tex_coords += (u1, v1, u2, v1, u2, v2, u1, v2)
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glEnable(GL_TEXTURE_2D)
+            glColor4f(1, 1, 1, 1)
+            pyglet.graphics.draw(len(vertices) // 2, GL_QUADS, ('v2f', vertices), ('t2f', tex_coords))
+            glDisable(GL_TEXTURE_2D)
+            glBindTexture(GL_TEXTURE_2D, 0)
+        if self.dark_spans:
+            vertices = []
+            for x, y, w, h in self.dark_spans:
+                vertices += (x, y, x + w, y, x + w, y + h, x, y + h)
+            glColor4f(*ambient, 1)
+            pyglet.graphics.draw(len(vertices) // 2, GL_QUADS, ('v2f', vertices))
+
+    @property
+    def coverage(self):
+        return sum(w * h for _, _, w, h in self.lit_spans) / (self.width * self.height)
+
+    def delete(self):
+        glDeleteFramebuffers(1, ctypes.byref(self.fbo))
+        glDeleteTextures(1, ctypes.byref(self.texture))
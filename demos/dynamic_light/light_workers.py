@@ -0,0 +1,65 @@
+import os
+import concurrent.futures
+
+import lighting
+
+def cast_chunk(origins, rays, radii, edges):
+    return lighting.cast_light_rays(origins, rays, edges, radii)
+
+def sweep_chunk(origins, radii, split, bound_sides):
+    return lighting.visibility_polygons(origins, radii, split, bound_sides)
+
+class LightWorkers:
+    # Light polygons computed on a pool of threads, off the render thread. The kernels release the GIL, so the threads
+    # cast in parallel. Each frame the polygons that are ready are handed to their light sources, and the others keep
+    # the previous polygon until their worker is done. Only light sources without any polygon yet are waited for.
+    def __init__(self, threads=None):
+        self.threads = threads or os.cpu_count() or 1
+        self.pool = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix="light")
+        self.jobs = {}  # Future: the light sources its polygons are for, in order
+        self.in_flight = set()
+
+    def submit(self, light_sources, geometry):
+        # Snapshots of the positions, rays and edges are taken here, as the render thread goes on changing them. The
+        # split edges are the geometry's cached ones, which are replaced rather than changed.
+        light_sources = [d for d in light_sources if d not in self.in_flight]
+        if not light_sources:
+            return
+        edges = geometry.edges.copy()
+        casting = [d for d in light_sources if not d.sweep]
+        sweeping = [d for d in light_sources if d.sweep]
+        split = geometry.split_edges() if sweeping else None
+        for chunk in self.chunks(casting):
+            future = self.pool.submit(cast_chunk, [(d.x, d.y) for d in chunk], [d.rays for d in chunk],
+                                      [d.radius for d in chunk], edges)
+            self.jobs[future] = chunk
+        for chunk in self.chunks(sweeping):
+            future = self.pool.submit(sweep_chunk, [(d.x, d.y) for d in chunk], [d.radius for d in chunk], split,
+                                      chunk[0].quality_passes)
+            self.jobs[future] = chunk
+        for d in light_sources:
+            d.updated_rcp = False
+            self.in_flight.add(d)
+
+    def chunks(self, light_sources):
+        count = min(self.threads, len(light_sources))
+        return [light_sources[i::count] for i in range(count)]
+
+    def collect(self, wait=False):
+        # Hand out the finished polygons, or all of them once they're done if wait. Returns how many light sources got
+        # a new one.
+        delivered = 0
+        for future, chunk in list(self.jobs.items()):
+            if not wait and not future.done() and all(d.polygon is not None for d in chunk):
+                continue
+            del self.jobs[future]
+            for d, polygon in zip(chunk, future.result()):
+                d.polygon = polygon
+                d.raycasts = polygon.tolist()
+                self.in_flight.discard(d)
+            delivered += len(chunk)
+        return delivered
+
+    def shutdown(self):
+        self.collect(wait=True)
+        self.pool.shutdown()
@@ -3,6 +3,7 @@ import itertools
 
 import numba
 from numba import jit, float64
+import numpy as np
 from pyglet.gl import * # pylint: disable=W0614
 
 from gl_utilities import (
@@ -82,10 +83,8 @@ def raycast_preprocessing(mx, my, quality_passes, vertex_cast_multiplies, fallba
             a = (i/fallback_passes) * math.tau
             vertices_p.append(vector_at_angle(a, radius))
     vertices_p.sort(key=vector_angle)
-    edges_p = [sorted([(e[0][0]-mx, e[0][1]-my), 
-                       (e[1][0]-mx, e[1][1]-my)], 
-                      key=vector_angle) 
-               for e in edges]
+    edges_p = [sorted([(x1, y1), (x2, y2)], key=vector_angle)
+               for x1, y1, x2, y2 in (as_edge_array(edges) - (mx, my, mx, my)).tolist()]
     return vertices_p, edges_p
 
 def get_light_raycasts(mx, my, quality_passes, vertex_cast_multiplies, fallback_passes, 
@@ -146,3 +145,407 @@ def get_light_raycasts(mx, my, quality_passes, vertex_cast_multiplies, fallback_
     for i in to_dereverse:
         edges[i].reverse()
     return raycasts, all_raycasts
+
+
+# Batched engine: rays of any number of light sources cast against all edges by one compiled kernel.
+# Polygons are arrays of points relative to their light source, sorted by angle like get_light_raycasts' raycasts.
+
+def as_vertex_array(vertices):
+    return np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+
+def as_edge_array(edges):
+    # One row of x1, y1, x2, y2 per edge.
+    return np.asarray(edges, dtype=np.float64).reshape(-1, 4)
+
+def light_rays(origins, radius, vertices, quality_passes, vertex_cast_multiplies):
+    """Ray vectors of every light source, shape (lights, rays, 2): the same rays raycast_preprocessing makes."""
+    origins, vertices = as_vertex_array(origins), as_vertex_array(vertices)
+    angles = np.arctan2(vertices[None, :, 1] - origins[:, None, 1], vertices[None, :, 0] - origins[:, None, 0])
+    offsets = np.arange(-vertex_cast_multiplies, vertex_cast_multiplies + 1) * 0.015
+    vertex_angles = (angles[:, :, None] + offsets).reshape(len(origins), -1)
+    pass_angles = np.broadcast_to(np.arange(quality_passes + 1) / quality_passes * math.tau,
+                                  (len(origins), quality_passes + 1))
+    angles = np.concatenate((vertex_angles, pass_angles), axis=1)
+    rays = np.stack((np.cos(angles), np.sin(angles)), axis=2) * radius
+    order = np.argsort(np.arctan2(rays[:, :, 1], rays[:, :, 0]), axis=1, kind='stable')
+    return np.take_along_axis(rays, order[:, :, None], axis=1)
+
+@jit(nopython=True, nogil=True, cache=True)
+def cast_rays(origins, owners, rays, edges, starts, near, prec=5e-4):
+    # Ray k starts at origins[owners[k]] and ends at rays[k] relative to it. It's cut short by the nearest of the
+    # edges near[starts[owners[k]]:starts[owners[k] + 1]], counting edges it touches within prec of their ends.
+    hits = np.empty_like(rays)
+    for k in range(len(rays)):
+        ox, oy = origins[owners[k], 0], origins[owners[k], 1]
+        dx, dy = rays[k, 0], rays[k, 1]
+        nearest = 1.0
+        for e in near[starts[owners[k]]:starts[owners[k] + 1]]:
+            px, py = edges[e, 0] - ox, edges[e, 1] - oy
+            rx, ry = edges[e, 2] - edges[e, 0], edges[e, 3] - edges[e, 1]
+            denom = dx * ry - dy * rx
+            if denom == 0:
+                continue
+            t = (px * ry - py * rx) / denom
+            if t < 0 or t >= nearest:
+                continue
+            s = (px * dy - py * dx) / denom
+            margin = prec / math.hypot(rx, ry)
+            if -margin <= s <= 1 + margin:
+                nearest = t
+        hits[k, 0], hits[k, 1] = dx * nearest, dy * nearest
+    return hits
+
+def every_edge(lights, edges):
+    """Every edge for each of the light sources, in the form near_edges gives."""
+    return np.arange(lights + 1) * len(edges), np.tile(np.arange(len(edges)), lights)
+
+def cast_light_rays(origins, rays, edges, radii=None):
+    """
+    Polygons of light sources at origins, given a (rays, 2) array of ray vectors for each one. With their radii, each
+    one is only cast against the edges within its radius.
+    """
+    if not len(rays):
+        return []
+    edges = as_edge_array(edges)
+    counts = [len(r) for r in rays]
+    owners = np.repeat(np.arange(len(rays)), counts)
+    starts, near = every_edge(len(rays), edges) if radii is None else near_edges(origins, radii, edges)
+    hits = cast_rays(as_vertex_array(origins), owners, np.concatenate(rays), edges, starts, near)
+    return np.split(hits, np.cumsum(counts)[:-1])
+
+def light_polygons(origins, radius, vertices, edges, quality_passes, vertex_cast_multiplies):
+    """Polygons of light sources at origins, shape (lights, rays, 2)."""
+    edges = as_edge_array(edges)
+    rays = light_rays(origins, radius, vertices, quality_passes, vertex_cast_multiplies)
+    owners = np.repeat(np.arange(rays.shape[0]), rays.shape[1])
+    hits = cast_rays(as_vertex_array(origins), owners, rays.reshape(-1, 2), edges, *every_edge(len(rays), edges))
+    return hits.reshape(rays.shape)
+
+# Broad phase: edges binned by their bounds into a uniform grid, so that each light source only gets the edges that
+# come within its radius, looking in the cells its radius covers instead of through every edge.
+
+@jit(nopython=True, nogil=True, cache=True)
+def _cell_range(lo, hi, origin, cell, count):
+    return max(int(math.floor((lo - origin) / cell)), 0), min(int(math.floor((hi - origin) / cell)), count - 1)
+
+@jit(nopython=True, nogil=True, cache=True)
+def _edge_cells(edges, e, x0, y0, cell, cols, rows):
+    c1, c2 = _cell_range(min(edges[e, 0], edges[e, 2]), max(edges[e, 0], edges[e, 2]), x0, cell, cols)
+    r1, r2 = _cell_range(min(edges[e, 1], edges[e, 3]), max(edges[e, 1], edges[e, 3]), y0, cell, rows)
+    return c1, c2, r1, r2
+
+@jit(nopython=True, nogil=True, cache=True)
+def _edge_grid(edges, x0, y0, cell, cols, rows):
+    # Edges in each cell, cell c's being indices[starts[c]:starts[c + 1]].
+    counts = np.zeros(cols * rows + 1, dtype=np.int64)
+    for e in range(len(edges)):
+        c1, c2, r1, r2 = _edge_cells(edges, e, x0, y0, cell, cols, rows)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                counts[row * cols + col + 1] += 1
+    starts = np.cumsum(counts)
+    indices = np.empty(starts[-1], dtype=np.int64)
+    filled = starts[:-1].copy()
+    for e in range(len(edges)):
+        c1, c2, r1, r2 = _edge_cells(edges, e, x0, y0, cell, cols, rows)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                indices[filled[row * cols + col]] = e
+                filled[row * cols + col] += 1
+    return starts, indices
+
+@jit(nopython=True, nogil=True, cache=True)
+def _near_edges(origins, radii, edges, x0, y0, cell, cols, rows, cell_starts, cell_edges):
+    seen = np.full(len(edges), -1, dtype=np.int64)
+    starts = np.zeros(len(origins) + 1, dtype=np.int64)
+    near = []
+    for i in range(len(origins)):
+        ox, oy, radius = origins[i, 0], origins[i, 1], radii[i]
+        c1, c2 = _cell_range(ox - radius, ox + radius, x0, cell, cols)
+        r1, r2 = _cell_range(oy - radius, oy + radius, y0, cell, rows)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                c = row * cols + col
+                for e in cell_edges[cell_starts[c]:cell_starts[c + 1]]:
+                    if seen[e] == i:
+                        continue
+                    seen[e] = i
+                    # Distance from the light source to the nearest point of the edge.
+                    px, py = edges[e, 0] - ox, edges[e, 1] - oy
+                    rx, ry = edges[e, 2] - edges[e, 0], edges[e, 3] - edges[e, 1]
+                    length = rx * rx + ry * ry
+                    t = min(max(-(px * rx + py * ry) / length, 0.0), 1.0) if length > 0 else 0.0
+                    if math.hypot(px + rx * t, py + ry * t) <= radius:
+                        near.append(e)
+        starts[i + 1] = len(near)
+    near = np.array(near, dtype=np.int64)
+    for i in range(len(origins)):
+        near[starts[i]:starts[i + 1]].sort()  # In the order of the edges, as if none were left out.
+    return starts, near
+
+def edge_grid(edges, cell_size):
+    # Grid of square cells over the edges' bounds: x0, y0, cell_size, cols, rows, then the edges in each cell as
+    # _edge_grid returns them. edges should not be empty.
+    x0, y0 = min(edges[:, 0].min(), edges[:, 2].min()), min(edges[:, 1].min(), edges[:, 3].min())
+    cols = int((max(edges[:, 0].max(), edges[:, 2].max()) - x0) // cell_size) + 1
+    rows = int((max(edges[:, 1].max(), edges[:, 3].max()) - y0) // cell_size) + 1
+    return (x0, y0, cell_size, cols, rows) + tuple(_edge_grid(edges, x0, y0, cell_size, cols, rows))
+
+def near_edges(origins, radii, edges, cell_size=64.0):
+    """
+    Edges within the radius of each light source at origins: the ones of light source i are
+    near[starts[i]:starts[i + 1]], indices into edges.
+    """
+    origins, edges = as_vertex_array(origins), as_edge_array(edges)
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), len(origins))
+    if not len(edges):
+        return np.zeros(len(origins) + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return _near_edges(origins, radii, edges, *edge_grid(edges, cell_size))
+
+def vertices_within(vertices, x, y, radius):
+    """The vertices within radius of (x, y), which are the only ones casting shadows inside it."""
+    vertices = as_vertex_array(vertices)
+    return vertices[np.hypot(vertices[:, 0] - x, vertices[:, 1] - y) <= radius]
+
+# Angular sweep: exact visibility polygons from the edges' endpoints, without casting rays.
+# Edges are split where they cross (boxes may overlap) so that the nearest edge in every direction is well defined,
+# then for each light source the endpoints are swept by angle, keeping the edges the sweep is over ordered by distance.
+# Only edges sharing a cell of the edge grid can cross, as a crossing is inside both edges' bounds.
+
+@jit(nopython=True, nogil=True, cache=True)
+def _crossings(edges, x0, y0, cell, cols, rows, cell_starts, cell_edges):
+    # Edge index and parameter along it of every point where two edges properly cross.
+    owners, params = [], []
+    seen = np.full(len(edges), -1, dtype=np.int64)  # The last edge i each edge was tested against.
+    for i in range(len(edges)):
+        ax, ay, bx, by = edges[i, 0], edges[i, 1], edges[i, 2], edges[i, 3]
+        c1, c2, r1, r2 = _edge_cells(edges, i, x0, y0, cell, cols, rows)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                c = row * cols + col
+                for j in cell_edges[cell_starts[c]:cell_starts[c + 1]]:
+                    # Each pair once, from its lower index.
+                    if j <= i or seen[j] == i:
+                        continue
+                    seen[j] = i
+                    cx, cy, dx, dy = edges[j, 0], edges[j, 1], edges[j, 2], edges[j, 3]
+                    if max(ax, bx) < min(cx, dx) or max(cx, dx) < min(ax, bx) or \
+                       max(ay, by) < min(cy, dy) or max(cy, dy) < min(ay, by):
+                        continue
+                    rx, ry, sx, sy = bx - ax, by - ay, dx - cx, dy - cy
+                    denom = rx * sy - ry * sx
+                    if denom == 0:
+                        continue
+                    t = ((cx - ax) * sy - (cy - ay) * sx) / denom
+                    u = ((cx - ax) * ry - (cy - ay) * rx) / denom
+                    if 0 < t < 1 and 0 < u < 1:
+                        owners.append(i); params.append(t)
+                        owners.append(j); params.append(u)
+    return np.array(owners, dtype=np.int64), np.array(params, dtype=np.float64)
+
+@jit(nopython=True, nogil=True, cache=True)
+def _split_at(edges, owners, params):
+    # Each edge cut at its crossings in order along it, the pieces in the order of the edges.
+    starts = np.zeros(len(edges) + 1, dtype=np.int64)
+    for o in owners:
+        starts[o + 1] += 1
+    starts = np.cumsum(starts)
+    by_owner = np.empty(len(params))
+    filled = starts[:-1].copy()
+    for k in range(len(owners)):
+        by_owner[filled[owners[k]]] = params[k]
+        filled[owners[k]] += 1
+    pieces = np.empty((len(edges) + len(params), 4))
+    m = 0
+    for e in range(len(edges)):
+        ax, ay, rx, ry = edges[e, 0], edges[e, 1], edges[e, 2] - edges[e, 0], edges[e, 3] - edges[e, 1]
+        cuts = np.sort(by_owner[starts[e]:starts[e + 1]])
+        t1 = 0.0
+        for k in range(len(cuts) + 1):
+            t2 = cuts[k] if k < len(cuts) else 1.0
+            pieces[m, 0], pieces[m, 1] = ax + rx * t1, ay + ry * t1
+            pieces[m, 2], pieces[m, 3] = ax + rx * t2, ay + ry * t2
+            t1 = t2
+            m += 1
+    return pieces
+
+def split_crossing_edges(edges, cell_size=64.0):
+    """Edges, shape (edges, 4), split where they cross so that they only meet at their ends."""
+    edges = as_edge_array(edges)
+    if not len(edges):
+        return edges
+    owners, params = _crossings(edges, *edge_grid(edges, cell_size))
+    if not len(owners):
+        return edges
+    return _split_at(edges, owners, params)
+
+@jit(nopython=True, nogil=True, cache=True)
+def _ray_distance(segments, k, angle):
+    # Distance from the origin to segment k along the ray at angle.
+    dx, dy = math.cos(angle), math.sin(angle)
+    px, py = segments[k, 0], segments[k, 1]
+    rx, ry = segments[k, 2] - px, segments[k, 3] - py
+    return (px * ry - py * rx) / (dx * ry - dy * rx)
+
+@jit(nopython=True, nogil=True, cache=True)
+def _nearer(segments, starts, ends, a, b):
+    # Compared halfway into the span both segments share, where neither is at its end. Segments don't cross, so which
+    # is nearer holds for as long as both are active.
+    between = (max(starts[a], starts[b]) + min(ends[a], ends[b])) / 2
+    return _ray_distance(segments, a, between) < _ray_distance(segments, b, between)
+
+@jit(nopython=True, nogil=True, cache=True)
+def _sift(segments, starts, ends, heap, position, count, j):
+    # Moves heap[j] up or down to where it belongs, keeping position[k] the index of segment k in heap.
+    k = heap[j]
+    while j > 0 and _nearer(segments, starts, ends, k, heap[(j - 1) // 2]):
+        heap[j] = heap[(j - 1) // 2]
+        position[heap[j]] = j
+        j = (j - 1) // 2
+    while 2 * j + 1 < count:
+        child = 2 * j + 1
+        if child + 1 < count and _nearer(segments, starts, ends, heap[child + 1], heap[child]):
+            child += 1
+        if not _nearer(segments, starts, ends, heap[child], k):
+            break
+        heap[j] = heap[child]
+        position[heap[j]] = j
+        j = child
+    heap[j] = k
+    position[k] = j
+
+@jit(nopython=True, nogil=True, cache=True)
+def _sweep(segments, starts, ends, event_angles, event_segments, event_adds):
+    # The active segments are in a binary heap, nearest on top, with each one's index in it so it can be removed.
+    heap = np.empty(len(segments), dtype=np.int64)
+    position = np.empty(len(segments), dtype=np.int64)
+    count = 0
+    points = np.empty((2 * len(event_angles), 2))
+    m = 0
+    i = 0
+    while i < len(event_angles):
+        angle = event_angles[i]
+        before = heap[0] if count else -1
+        while i < len(event_angles) and event_angles[i] == angle:
+            k = event_segments[i]
+            if event_adds[i]:
+                heap[count] = k
+                count += 1
+                _sift(segments, starts, ends, heap, position, count, count - 1)
+            else:
+                j = position[k]
+                count -= 1
+                if j < count:
+                    heap[j] = heap[count]
+                    _sift(segments, starts, ends, heap, position, count, j)
+            i += 1
+        after = heap[0] if count else -1
+        if before != after:
+            for k in (before, after):
+                if k >= 0:
+                    distance = _ray_distance(segments, k, angle)
+                    points[m, 0], points[m, 1] = math.cos(angle) * distance, math.sin(angle) * distance
+                    m += 1
+    return points[:m]
+
+def clip_to_convex(edges, polygon):
+    """The parts of edges, shape (edges, 4), inside the convex polygon, its (n, 2) corners counterclockwise."""
+    a, d = polygon, np.roll(polygon, -1, axis=0) - polygon
+    p, q = edges[:, :2], edges[:, 2:]
+    # How far inside each side the ends are, scaled by the side's length.
+    fp = d[None, :, 0] * (p[:, None, 1] - a[None, :, 1]) - d[None, :, 1] * (p[:, None, 0] - a[None, :, 0])
+    fq = d[None, :, 0] * (q[:, None, 1] - a[None, :, 1]) - d[None, :, 1] * (q[:, None, 0] - a[None, :, 0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = fp / (fp - fq)
+    # Where each edge enters the polygon, across the sides its start is outside of, and where it leaves it.
+    t1 = np.where((fp < 0) & (fq >= 0), t, 0.0).max(axis=1)
+    t2 = np.where((fp >= 0) & (fq < 0), t, 1.0).min(axis=1)
+    keep = ~((fp < 0) & (fq < 0)).any(axis=1) & (t1 < t2)
+    p, q, t1, t2 = p[keep], q[keep], t1[keep, None], t2[keep, None]
+    # Ends that are inside are kept as they are, rather than recomputed.
+    return np.hstack((np.where(t1 > 0, p + (q - p) * t1, p), np.where(t2 < 1, p + (q - p) * t2, q)))
+
+def visibility_polygon(mx, my, radius, edges, bound_sides=30):
+    """
+    Polygon of what a light source at (mx, my) sees, relative to it and sorted by angle like light_polygons.
+    Edges should not cross (see split_crossing_edges). Where no edge is in the way, the polygon follows a regular
+    polygon with bound_sides sides inscribed in the radius.
+    """
+    bound = np.arange(bound_sides + 1) / bound_sides * math.tau
+    bound = np.stack((np.cos(bound), np.sin(bound)), axis=1) * radius
+    # Cut to the bound polygon, so that no edge crosses its sides and every segment stays in the radius. Edges within
+    # the circle inscribed in it can't reach its sides, so only the others are clipped.
+    edges = as_edge_array(edges) - (mx, my, mx, my)
+    inner = (radius * math.cos(math.pi / bound_sides)) ** 2
+    inside = (edges[:, 0] ** 2 + edges[:, 1] ** 2 < inner) & (edges[:, 2] ** 2 + edges[:, 3] ** 2 < inner)
+    edges = np.vstack((edges[inside], clip_to_convex(edges[~inside], bound[:-1])))
+    segments = np.vstack((edges, np.hstack((bound[:-1], bound[1:]))))
+
+    # Counterclockwise around the light source, without the ones seen edge-on.
+    p, q = segments[:, :2], segments[:, 2:]
+    cross = p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0]
+    p, q = np.where(cross[:, None] > 0, p, q)[cross != 0], np.where(cross[:, None] > 0, q, p)[cross != 0]
+    starts, ends = np.arctan2(p[:, 1], p[:, 0]), np.arctan2(q[:, 1], q[:, 0])
+
+    # Segments across the negative x axis are cut in two there, so the sweep can go from -pi to pi.
+    wrap = starts > ends
+    s = (p[wrap, 1] / (p[wrap, 1] - q[wrap, 1]))[:, None]
+    cut = p[wrap] + (q[wrap] - p[wrap]) * s
+    cut[:, 1] = 0
+    p = np.vstack((p[~wrap], p[wrap], cut))
+    q = np.vstack((q[~wrap], cut, q[wrap]))
+    starts = np.concatenate((starts[~wrap], starts[wrap], np.full(len(cut), -math.pi)))
+    ends = np.concatenate((ends[~wrap], np.full(len(cut), math.pi), ends[wrap]))
+    keep = starts < ends
+    segments, starts, ends = np.hstack((p, q))[keep], starts[keep], ends[keep]
+
+    # Removals before additions at the same angle.
+    count = len(segments)
+    event_angles = np.concatenate((ends, starts))
+    event_adds = np.concatenate((np.zeros(count, dtype=np.bool_), np.ones(count, dtype=np.bool_)))
+    order = np.lexsort((event_adds, event_angles))
+    event_segments = np.concatenate((np.arange(count), np.arange(count)))[order]
+    return _sweep(segments, starts, ends, event_angles[order], event_segments, event_adds[order])
+
+def visibility_polygons(origins, radii, edges, bound_sides=30):
+    """visibility_polygon of each light source at origins, only given the edges within its radius."""
+    edges = as_edge_array(edges)
+    starts, near = near_edges(origins, radii, edges)
+    return [visibility_polygon(x, y, radius, edges[near[starts[i]:starts[i + 1]]], bound_sides)
+            for i, ((x, y), radius) in enumerate(zip(origins, np.broadcast_to(radii, len(origins))))]
+
+def point_in_polygon(polygon, x, y):
+    a, b = polygon, np.roll(polygon, -1, axis=0)
+    crosses = (a[:, 1] > y) != (b[:, 1] > y)
+    a, b = a[crosses], b[crosses]
+    xs = a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+    return np.count_nonzero(xs > x) % 2 == 1
+
+def polygon_intersects_rect(polygon, x, y, w, h):
+    """Whether the closed polygon, an (n, 2) array of its points in order, and the rectangle overlap or touch."""
+    a, b = polygon, np.roll(polygon, -1, axis=0)
+    # Edges whose bounds overlap the rectangle and that don't have all its corners on one side.
+    near = (np.minimum(a[:, 0], b[:, 0]) <= x + w) & (np.maximum(a[:, 0], b[:, 0]) >= x) & \
+           (np.minimum(a[:, 1], b[:, 1]) <= y + h) & (np.maximum(a[:, 1], b[:, 1]) >= y)
+    if near.any():
+        a, d = a[near], b[near] - a[near]
+        corners = np.array(((x, y), (x + w, y), (x, y + h), (x + w, y + h)), dtype=np.float64)
+        side = d[:, None, 0] * (corners[None, :, 1] - a[:, None, 1]) - \
+               d[:, None, 1] * (corners[None, :, 0] - a[:, None, 0])
+        if ((side.min(axis=1) <= 0) & (side.max(axis=1) >= 0)).any():
+            return True
+    # No edge touches it, so the rectangle is either inside the polygon or apart from it.
+    return point_in_polygon(polygon, x, y)
+
+def light_fan(mx, my, polygon, color, strength, radius):
+    """
+    Vertices and colours of the triangle fan lighting a polygon from (mx, my): the centre in full colour, then the
+    polygon's points, back to the first one, fading with distance down to strength at the radius.
+    """
+    points = np.vstack(((0, 0), polygon, polygon[:1]))
+    fade = np.minimum(1, 1 - (1 - strength) * np.hypot(points[:, 0], points[:, 1]) / radius)
+    fade[0] = 1
+    colors = np.empty((len(points), 4))
+    colors[:, :3] = color[:3]
+    colors[:, 3] = color[3] * fade
+    return (points + (mx, my)).ravel(), colors.ravel()
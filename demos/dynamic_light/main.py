@@ -1,7 +1,6 @@
 import math
 import itertools
 import contextlib
-import ctypes
 import cProfile, pstats
 
 import pyglet
@@ -9,12 +8,11 @@ from pyglet.gl import * # pylint: disable=W0614
 
 from constants import WIDTH, HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT
 from letterbox import LetterboxViewport
-from gl_utilities import (
-    glTriangleFanContext, glTrianglesContext,
-    glLinesContext, glQuadContext,
-    draw_polygon
-)
+from gl_utilities import glQuadContext, RetainedShape, add_polygon
 from entities import LightSource, Box, BoxSizeDrag
+from light_map import LightMap
+from light_workers import LightWorkers
+from geometry import Geometry
 
 requires_letterbox = WIDTH != SCREEN_WIDTH or HEIGHT != SCREEN_HEIGHT
 
@@ -42,6 +40,8 @@ class App(pyglet.window.Window):
         (0, 1, 0, ls), (0, 0, 1, ls)
     ))
     grid_gap = 20
+    # Light map resolution relative to the scene, cycled through with F11
+    light_map_scales = itertools.cycle((1, 1/2, 1/4))
     out_gap = 3
     def __init__(self, *, enable_letterbox=requires_letterbox):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, "Dynamic lighting demo")
@@ -52,21 +52,18 @@ class App(pyglet.window.Window):
         self.label = pyglet.text.Label("0", anchor_x="left", anchor_y="baseline")
         self.label.y = HEIGHT - self.label.content_height + 4
         self.fps_values, self.fps_update_delay = [], 0
+        self.recomputes = 0  # Light sources recomputed in the last frame
         
         self.light_sources = []
         self.boxes = []
+        # Edges and vertices light is cast against: the border, then every box
+        self.geometry = Geometry()
         g = self.out_gap
-        self.edges = [
-            [(g, g), (WIDTH - g, g)],
-            [(g, g), (g, HEIGHT - g)],
-            [(WIDTH - g, g), (WIDTH - g, HEIGHT - g)],
-            [(g, HEIGHT - g), (WIDTH - g, HEIGHT - g)]
-        ]
-        self.vertices = [
-            [g, g], [WIDTH - g, g],
-            [g, HEIGHT - g], [WIDTH - g, HEIGHT - g]
-        ]
-        self.rects = []
+        self.geometry.set_rect(self.geometry.add(), g, g, WIDTH - 2*g, HEIGHT - 2*g)
+        # Rebuilt only when what they show changes
+        self.grid = RetainedShape()
+        self.box_shapes = RetainedShape()
+        self.drag_points = RetainedShape()
         self.add_light_source(WIDTH // 2, HEIGHT // 2)
         self.add_box(4*g, 2*g)
         self.dragging = None
@@ -74,6 +71,10 @@ class App(pyglet.window.Window):
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE)
         glClearColor(*self.bg_color)
+        self.light_map = LightMap(WIDTH, HEIGHT, next(self.light_map_scales))
+        # Light polygons computed on worker threads, toggled with F12
+        self.light_workers = LightWorkers()
+        self.threaded_light = True
         if self.enable_letterbox:
             self.letterbox = LetterboxViewport(self, WIDTH, HEIGHT)
         else:
@@ -94,18 +95,10 @@ class App(pyglet.window.Window):
         
         self.draw_grid()
         
-        glBindFramebuffer(GL_FRAMEBUFFER, fbo)
-        glBindTexture(GL_TEXTURE_2D, light_texture)
         self.draw_light_to_texture()
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
-
-        glBindTexture(GL_TEXTURE_2D, light_texture)
         self.render_light()
-        glBindTexture(GL_TEXTURE_2D, 0)
 
-        for d in self.boxes:
-            d.draw()
+        self.draw_boxes()
         self.draw_drag_points()
         self.label.draw()
 
@@ -116,7 +109,8 @@ class App(pyglet.window.Window):
             self.fps_values.pop(0)
         avg = sum(self.fps_values) / len(self.fps_values)
         if self.fps_update_delay == 0:
-            self.label.text = f"{round(avg, 1)} (ls: {len(self.light_sources)}, b: {len(self.boxes)})"
+            self.label.text = f"{round(avg, 1)} (ls: {len(self.light_sources)}, b: {len(self.boxes)}, " \
+                              f"rc: {self.recomputes})"
             self.fps_update_delay = 20
         else:
             self.fps_update_delay -= 1
@@ -124,17 +118,18 @@ class App(pyglet.window.Window):
             d.update(delta)
         for d in self.boxes:
             d.update(delta)
+            if d.dirty_bounds is not None:
+                LightSource.invalidate(self.light_sources, *d.dirty_bounds)
+                d.dirty_bounds = None
     
     def _translate_for_letterbox(self, x, y):
         return (x // (self.width // self.letterbox.scene_width), 
                 y // (self.height // self.letterbox.scene_height))
 
     def handle_light_entity_change(self, d):
+        # Boxes invalidate the light sources that see them once their edges change, in update()
         if isinstance(d, LightSource):
             d.force_rcp = True
-        elif isinstance(d, (Box, BoxSizeDrag)):
-            for d in self.light_sources:
-                d.force_rcp = True                
 
     def on_mouse_press(self, x, y, buttons, modifiers):
         if self.enable_letterbox:
@@ -174,6 +169,8 @@ class App(pyglet.window.Window):
                     self.light_sources.remove(self.dragging)
                 elif isinstance(self.dragging, Box):
                     self.boxes.remove(self.dragging)
+                    LightSource.invalidate(self.light_sources, self.dragging.lx, self.dragging.ly,
+                                           self.dragging.lw, self.dragging.lh)
                 self.dragging = None
 
     def on_mouse_release(self, x, y, buttons, modifiers):
@@ -199,6 +196,12 @@ class App(pyglet.window.Window):
             if self.profiler is not None:
                 self.profiler.stop()
                 self.profiler = None
+        elif symbol == pyglet.window.key.F11:
+            self.light_map.set_scale(next(self.light_map_scales))
+        elif symbol == pyglet.window.key.F12:
+            self.threaded_light = not self.threaded_light
+            if not self.threaded_light:
+                self.light_workers.collect(wait=True)
         if self.light_sources: 
             if symbol == pyglet.window.key.LEFT:
                 self.light_sources[0].x -= 1
@@ -211,37 +214,46 @@ class App(pyglet.window.Window):
             elif symbol == pyglet.window.key.F9:
                 for d in self.light_sources:
                     d.auto_rcp = not d.auto_rcp
+            elif symbol == pyglet.window.key.F10:
+                for d in self.light_sources:
+                    d.sweep = not d.sweep
             else:
                 return
             self.handle_light_entity_change(self.light_sources[0])
 
     def add_light_source(self, x, y):
         self.light_sources.append(
-            LightSource(x, y, next(self.colors), self.vertices, self.edges, self.rects, False)
+            LightSource(x, y, next(self.colors), self.geometry, False)
         )
         self.handle_light_entity_change(self.light_sources[-1])
 
     def add_box(self, x, y):
-        self.boxes.append(Box(x, y, 100, 100, self.vertices, self.edges, self.rects))
+        self.boxes.append(Box(x, y, 100, 100, self.geometry))
         self.handle_light_entity_change(self.boxes[-1])
 
     def draw_grid(self):
+        if self.grid.rebuild(self.grid_gap):
+            with self.grid.Lines() as lines:
+                for x in range(self.grid_gap, WIDTH, self.grid_gap):
+                    lines.Vertex2(x, 0)
+                    lines.Vertex2(x, HEIGHT)
+                for y in range(self.grid_gap, HEIGHT, self.grid_gap):
+                    lines.Vertex2(0, y)
+                    lines.Vertex2(WIDTH, y)
         glLineWidth(1)
-        glColor4f(1, 1, 1, 1)
-        for x in range(self.grid_gap, WIDTH, self.grid_gap):
-            with glLinesContext(x, 0) as lines:
-                lines.Vertex2(0, 0)
-                lines.Vertex2(0, HEIGHT)
-        for y in range(self.grid_gap, HEIGHT, self.grid_gap):
-            with glLinesContext(0, y) as lines:
-                lines.Vertex2(0, 0)
-                lines.Vertex2(WIDTH, 0)
+        self.grid.draw()
+
+    def draw_boxes(self):
+        if self.box_shapes.rebuild(*(d.bounds for d in self.boxes)):
+            for d in self.boxes:
+                d.add_to_shape(self.box_shapes)
+        self.box_shapes.draw()
 
     def draw_light_to_texture(self):
-        glBindTexture(GL_TEXTURE_2D, light_texture)
+        self.recomputes = LightSource.cast_all(self.light_sources,
+                                               self.light_workers if self.threaded_light else None)
+        self.light_map.begin(self.light_sources)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE)
-        glClearColor(0, 0, 0, 1)
-        glClear(GL_COLOR_BUFFER_BIT)
         if self.bg_light_color[3] > 0:
             glColor4f(*self.bg_light_color)
             with glQuadContext(0, 0):
@@ -251,59 +263,27 @@ class App(pyglet.window.Window):
                 glVertex2f(0, HEIGHT)
         for d in self.light_sources:
             d.draw()
+        self.light_map.end()
     
     def render_light(self):
-        glBindTexture(GL_TEXTURE_2D, light_texture)
-        glEnable(GL_TEXTURE_2D)
         glBlendFunc(GL_DST_COLOR, GL_ZERO)
-
-        glColor4f(1, 1, 1, 1)
-        with glQuadContext(0, 0) as quad:
-            glTexCoord2f(0, 0)
-            quad.Vertex2(0, 0)
-            glTexCoord2f(1, 0)
-            quad.Vertex2(WIDTH, 0)
-            glTexCoord2f(1, 1)
-            quad.Vertex2(WIDTH, HEIGHT)
-            glTexCoord2f(0, 1)
-            quad.Vertex2(0, HEIGHT)
-
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glDisable(GL_TEXTURE_2D)
+        # Where no light reaches, only the background light is left
+        r, g, b, a = self.bg_light_color
+        self.light_map.render((r * a, g * a, b * a))
 
     def draw_drag_points(self):
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        points = [(d.x, d.y) for d in self.light_sources]
         for d in self.boxes:
-            draw_polygon(d.x, d.y, 2, 6, (1, 0, 0, 1))
-            draw_polygon(d.x+d.w, d.y+d.h, 2, 6, (1, 0, 0, 1))
-        for d in self.light_sources:
-            draw_polygon(d.x, d.y, 2, 6, (1, 0, 0, 1))  
+            points += ((d.x, d.y), (d.x+d.w, d.y+d.h))
+        if self.drag_points.rebuild(*points):
+            for x, y in points:
+                add_polygon(self.drag_points, x, y, 2, 6, (1, 0, 0, 1))
+        self.drag_points.draw()
 
 if __name__ == "__main__":
     
     app = App()
-
-    # Setup framebuffer
-    fbo = GLuint()
-    glGenFramebuffers(1, ctypes.byref(fbo))
-    glBindFramebuffer(GL_FRAMEBUFFER, fbo)
-    glEnable(GL_BLEND)
-
-    # Setup light texture
-    light_texture = GLuint()
-    glGenTextures(1, ctypes.byref(light_texture))
-    glBindTexture(GL_TEXTURE_2D, light_texture)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, WIDTH, HEIGHT, 0, GL_RGBA, GL_UNSIGNED_BYTE, 0)
-    glFramebufferTexture2D(
-        GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, 
-        GL_TEXTURE_2D, light_texture, 0
-    )
-
-    assert glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE
-    glBindFramebuffer(GL_FRAMEBUFFER, 0)    
-    glBindTexture(GL_TEXTURE_2D, 0)
-
     pyglet.app.run()
-    glDeleteFramebuffers(1, ctypes.byref(fbo))
+    app.light_workers.shutdown()
+    app.light_map.delete()
@@ -27,6 +27,9 @@ class App(pyglet.window.Window):
                       for _ in range(self.grid_side)]
         self.colorarray = [[(0, 0, 0) for _ in range(self.grid_side)]
                            for _ in range(self.grid_side)]
+        # Rebuilt only when a square changes
+        self.board = RetainedShape()
+        self.board_lines = RetainedShape()
         pyglet.clock.schedule_interval(self.update, 1 / self.tps)
 
         # Chessboard knight
@@ -56,34 +59,41 @@ class App(pyglet.window.Window):
     def on_draw(self):        
         glClearColor(*self.bg_color)
         glClear(GL_COLOR_BUFFER_BIT)
-        possible_moves = self.possible_moves
-        for y in range(self.grid_side):
-            for x in range(self.grid_side):
-                ax = self.grid_pos[0]+x*self.grid_block
-                ay = self.grid_pos[1]+y*self.grid_block
-                a = self.array[y][x]
-                c = self.colorarray[y][x]
-                if a:
-                    glColor3f(a*c[0], a*c[1], a*c[2])
-                elif (x, y) in possible_moves:
-                    glColor3f(1, 0.98, 0.55)
-                else:
-                    glColor3f(1, 1, 1)
-                with glQuadContext(ax, ay) as quad:
-                    quad.Vertex2(0, 0)
-                    quad.Vertex2(self.grid_block, 0)
-                    quad.Vertex2(self.grid_block, self.grid_block)
-                    quad.Vertex2(0, self.grid_block)
-        glColor3f(0.14, 0.14, 0.14)
-        with glLinesContext(*self.grid_pos) as lines:
-            for x in range(self.grid_side + 1):
-                lines.Vertex2(x*self.grid_block, 0)
-                lines.Vertex2(x*self.grid_block, self.grid_side*self.grid_block)
-            for y in range(self.grid_side + 1):
-                lines.Vertex2(0, y*self.grid_block)
-                lines.Vertex2(self.grid_side*self.grid_block, y*self.grid_block)
+        self.draw_board()
         self.label.draw()
 
+    def draw_board(self):
+        if self.board.rebuild(self.grid_pos, self.grid_side, self.grid_block):
+            possible_moves = self.possible_moves
+            for y in range(self.grid_side):
+                for x in range(self.grid_side):
+                    ax = self.grid_pos[0]+x*self.grid_block
+                    ay = self.grid_pos[1]+y*self.grid_block
+                    a = self.array[y][x]
+                    c = self.colorarray[y][x]
+                    if a:
+                        self.board.Color4(a*c[0], a*c[1], a*c[2])
+                    elif (x, y) in possible_moves:
+                        self.board.Color4(1, 0.98, 0.55)
+                    else:
+                        self.board.Color4(1, 1, 1)
+                    with self.board.Quad(ax, ay) as quad:
+                        quad.Vertex2(0, 0)
+                        quad.Vertex2(self.grid_block, 0)
+                        quad.Vertex2(self.grid_block, self.grid_block)
+                        quad.Vertex2(0, self.grid_block)
+        if self.board_lines.rebuild(self.grid_pos, self.grid_side, self.grid_block):
+            self.board_lines.Color4(0.14, 0.14, 0.14)
+            with self.board_lines.Lines(*self.grid_pos) as lines:
+                for x in range(self.grid_side + 1):
+                    lines.Vertex2(x*self.grid_block, 0)
+                    lines.Vertex2(x*self.grid_block, self.grid_side*self.grid_block)
+                for y in range(self.grid_side + 1):
+                    lines.Vertex2(0, y*self.grid_block)
+                    lines.Vertex2(self.grid_side*self.grid_block, y*self.grid_block)
+        self.board.draw()
+        self.board_lines.draw()
+
     def update(self, delta):
         self.ticks += 1
         self.fps_values.append(round(pyglet.clock.get_fps(), 1))
@@ -128,6 +138,7 @@ class App(pyglet.window.Window):
         self.colorarray[y][x] = next(self.colorcycle)
         self.last = (x, y)
         self.last_color = self.colorarray[y][x]
+        self.board.invalidate()
 
 if __name__ == "__main__":
     app = App()
@@ -1,21 +1,33 @@
+import concurrent.futures
 import logging
+import time
 
 import pyglet
 
+import atlas
 import letterbox
-import level
+import main_menu
+import profiling
 import states
+import timestep
 
 
 # noinspection PyMethodOverriding,PyAbstractClass
 class App(pyglet.window.Window):
     """
     HOW GOOD PROGRAMMING PRACTICES DO NOT DISPROVE, BUT SUPPORT, THE USE OF GOD OBJECTS [READ MORE >>]
+
+    The window opens on the main menu, and once its first frame is drawn the level loads on a loader thread: first the
+    atlas pages are decoded and the level's modules imported (they bring numpy and pytmx with them), then, once the
+    atlas is uploaded on the main thread, the level is built. It is pushed over the menu when done.
     """
 
     tps = 60
+    atlas_images = ['entities.png', 'tileset.png']
+    trace_path = 'frame-trace.json'
 
     def __init__(self):
+        self.created = time.perf_counter()
         super().__init__(256, 256, resizable=True)
         self.set_minimum_size(168, 64)  # Go figure.
 
@@ -25,31 +37,110 @@ class App(pyglet.window.Window):
         self.key_state = pyglet.window.key.KeyStateHandler()
         self.push_handlers(self.key_state)
 
-        self.game_time_clock = pyglet.clock.Clock()
-        pyglet.clock.schedule(self.game_time_clock.tick)
-        self.game_time_clock.schedule_interval(lambda dt: self.on_update(dt), 1 / self.tps)
+        # F3 shows the frame profiler's overlay and records while it's shown, F4 exports the recording as a trace.
+        self.profiler_overlay = profiling.ProfilerOverlay(self)
+
+        # The simulation runs in fixed steps of 1 / tps, while drawing happens as often as the event loop allows.
+        self.timestep = timestep.FixedTimestep(self.tps, self.on_update)
+        self.alpha = 1.0  # How far rendering is between the previous and the current tick.
+        pyglet.clock.schedule(self.on_frame)
+
+        # Only advances with simulation ticks.
+        self.game_time_clock = pyglet.clock.Clock(time_function=lambda: self.timestep.time)
 
         pyglet.resource.path = ['res/img', 'res/lvl']
         pyglet.resource.reindex()
 
-        self.entities_image = pyglet.resource.image('entities.png')
-        self.tileset_image = pyglet.resource.image('tileset.png')
+        # Packed together, so that tiles and sprites are drawn without switching textures. Set once loaded.
+        self.atlas = None
+        self.entities_image = self.tileset_image = None
+        self.level = None
 
-        self.state_manager = states.StateManager(level.Level(self))
+        self.state_manager = states.StateManager(main_menu.MainMenu(self))
+        self.first_frame_time = self.level_time = None  # Seconds from creation, for startup measurements.
+        self._loader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='asset-loader')
+        self._loading = None
 
         logging.info(f"New app created: {self}")
 
+    def _read_assets(self):
+        # On the loader thread.
+        with profiling.scope('read assets'):
+            pages, placements = atlas.read_atlas(self.atlas_images)
+            import level  # Lazily, with everything it imports.
+        return pages, placements
+
+    def _build_level(self):
+        # On the loader thread, with the atlas uploaded. Nothing is drawn, so GL isn't touched.
+        import level
+        with profiling.scope('build level'):
+            return level.Level(self)
+
+    @property
+    def loading_progress(self) -> float:
+        return 1.0 if self.level is not None else 0.5 if self.atlas is not None else 0.0
+
+    def poll_loading(self, wait: bool = False) -> bool:
+        """Take the next loading step if the loader thread is done with the last one (or wait for all of them)."""
+        if self._loading is None and self.level is None:
+            self._loading = self._loader.submit(self._read_assets)
+        while self._loading is not None and (wait or self._loading.done()):
+            result = self._loading.result()
+            if self.atlas is None:
+                self.atlas = atlas.Atlas(*result)
+                self.entities_image = self.atlas['entities.png']
+                self.tileset_image = self.atlas['tileset.png']
+                self._loading = self._loader.submit(self._build_level)
+            else:
+                self.level = result
+                self.state_manager.push(self.level)
+                self._loading = None
+                self._loader.shutdown()
+                self.level_time = time.perf_counter() - self.created
+                logging.info(f"Level loaded {self.level_time:.3f} s after the app was created")
+        return self.level is not None
+
     def run(self):
         logging.info("Running main loop.")
         self.activate()
         pyglet.app.run()
 
+    def on_frame(self, dt):
+        profiling.profiler.begin_frame()
+        # The event loop runs this before drawing, so the first frame is drawn before on_draw starts loading.
+        if self.first_frame_time is not None:
+            self.poll_loading()
+        self.alpha = self.timestep.advance(dt)
+
     def on_update(self, dt):
-        self.state_manager.current.update()
+        self.state_manager.update()
+        self.game_time_clock.tick()
 
     def on_draw(self):
         with self.letterbox.draw():
-            self.state_manager.current.draw()
+            self.state_manager.draw(self.alpha)
+        if profiling.profiler.enabled:
+            self.profiler_overlay.draw()
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - self.created
+            logging.info(f"First frame drawn {self.first_frame_time:.3f} s after the app was created")
+            # Loading only starts now, so that it doesn't hold the first frame up.
+            self.poll_loading()
+
+    def close(self):
+        # Also reached from on_close, when the window's close button is pressed.
+        self._loader.shutdown(wait=False, cancel_futures=True)
+        if self.level is not None:
+            self.level.close()
+        super().close()
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == pyglet.window.key.F3:
+            profiling.profiler.enable(not profiling.profiler.enabled)
+        elif symbol == pyglet.window.key.F4 and profiling.profiler.enabled:
+            profiling.profiler.export_chrome_trace(self.trace_path)
+        else:
+            return super().on_key_press(symbol, modifiers)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+"""
+Texture atlas for the game's images, so that tiles and sprites all sample from as few textures as possible.
+
+Source images are shelf-packed into the smallest power-of-two page that holds them (or several pages of the maximum
+size, if they don't fit in one). The composed pages and the layout are cached under res/cache, keyed by the hashes of the
+source files, so later startups load the pages directly instead of packing again.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import *
+
+import pyglet
+
+__all__ = ['Atlas', 'pack', 'compose', 'read_atlas', 'load_atlas']
+
+
+logger = logging.getLogger(__name__)
+
+Placement = Tuple[int, int, int, int, int]  # page, x, y, w, h
+
+cache_version = 1
+
+
+def _shelf_pack(items: List[Tuple[str, Tuple[int, int]]], width: int, height: int,
+                padding: int) -> Tuple[Dict[str, Tuple[int, int]], List[Tuple[str, Tuple[int, int]]]]:
+    placed, rest = {}, []
+    x = y = shelf_height = 0
+    for name, (w, h) in items:
+        if x + w > width:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if w > width or y + h > height:
+            rest.append((name, (w, h)))
+            continue
+        placed[name] = x, y
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return placed, rest
+
+
+def pack(sizes: Dict[str, Tuple[int, int]], max_size: int = 2048,
+         padding: int = 0) -> Tuple[List[Tuple[int, int]], Dict[str, Placement]]:
+    """Page sizes and placements of images of the given sizes."""
+    items = sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+    for name, (w, h) in items:
+        if w > max_size or h > max_size:
+            raise ValueError(f"Image {name} ({w}x{h}) doesn't fit in a {max_size}x{max_size} atlas page")
+
+    # Smallest single page first, by area and then by how square it is.
+    area = sum(w * h for w, h in sizes.values())
+    powers = [1 << i for i in range(max_size.bit_length()) if 1 << i <= max_size]
+    for width, height in sorted(((w, h) for w in powers for h in powers if w * h >= area),
+                                key=lambda size: (size[0] * size[1], abs(size[0] - size[1]))):
+        placed, rest = _shelf_pack(items, width, height, padding)
+        if not rest:
+            return [(width, height)], {name: (0, x, y, *sizes[name]) for name, (x, y) in placed.items()}
+
+    pages, placements = [], {}
+    while items:
+        placed, items = _shelf_pack(items, max_size, max_size, padding)
+        placements.update({name: (len(pages), x, y, *sizes[name]) for name, (x, y) in placed.items()})
+        pages.append((max_size, max_size))
+    return pages, placements
+
+
+def compose(images: Dict[str, pyglet.image.AbstractImage], pages: List[Tuple[int, int]],
+            placements: Dict[str, Placement]) -> List[pyglet.image.ImageData]:
+    """Copy the images into RGBA pages on the CPU, without touching GL."""
+    buffers = [bytearray(width * height * 4) for width, height in pages]
+    for name, image in images.items():
+        page, x, y, w, h = placements[name]
+        page_width = pages[page][0]
+        data = image.get_image_data().get_data('RGBA', w * 4)
+        buffer = buffers[page]
+        for row in range(h):
+            start = ((y + row) * page_width + x) * 4
+            buffer[start:start + w * 4] = data[row * w * 4:(row + 1) * w * 4]
+    return [pyglet.image.ImageData(width, height, 'RGBA', bytes(buffer))
+            for (width, height), buffer in zip(pages, buffers)]
+
+
+class Atlas:
+    def __init__(self, pages: List[pyglet.image.AbstractImage], placements: Dict[str, Placement]):
+        self.textures = [page.get_texture() for page in pages]
+        self.placements = placements
+        self.regions = {name: self.textures[page].get_region(x, y, w, h)
+                        for name, (page, x, y, w, h) in placements.items()}
+
+    def __getitem__(self, name: str) -> pyglet.image.TextureRegion:
+        return self.regions[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.regions
+
+    @property
+    def occupancy(self) -> float:
+        """Fraction of the atlas texture area covered by images."""
+        return _occupancy(self.textures, self.placements)
+
+
+def _occupancy(pages: List[pyglet.image.AbstractImage], placements: Dict[str, Placement]) -> float:
+    used = sum(w * h for _, _, _, w, h in placements.values())
+    return used / sum(page.width * page.height for page in pages)
+
+
+def _cache_key(names: List[str], max_size: int, padding: int) -> str:
+    digest = hashlib.sha256(f"{cache_version} {max_size} {padding}".encode())
+    for name in names:
+        digest.update(name.encode())
+        with pyglet.resource.file(name) as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def read_atlas(names: List[str], cache_dir: Optional[str] = None, max_size: int = 2048,
+               padding: int = 0) -> Tuple[List[pyglet.image.ImageData], Dict[str, Placement]]:
+    """
+    Pages and placements of the atlas of the named resource images, from the cache if it is up to date, packed from the
+    sources otherwise. Doesn't touch GL, so it can run on a loader thread; Atlas uploads the pages.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(pyglet.resource.get_script_home(), 'res', 'cache')
+    layout_path = os.path.join(cache_dir, 'atlas.json')
+    key = _cache_key(names, max_size, padding)
+
+    try:
+        with open(layout_path) as file:
+            layout = json.load(file)
+        if layout['key'] == key:
+            pages = [pyglet.image.load(os.path.join(cache_dir, page)) for page in layout['pages']]
+            placements = {name: tuple(p) for name, p in layout['placements'].items()}
+            logger.info(f"Loaded atlas of {len(names)} images from cache: {len(pages)} page(s), "
+                        f"{_occupancy(pages, placements):.0%} occupied")
+            return pages, placements
+    except (OSError, ValueError, KeyError, pyglet.image.codecs.ImageDecodeException):
+        pass
+
+    images = {}
+    for name in names:
+        with pyglet.resource.file(name) as file:
+            images[name] = pyglet.image.load(name, file=file)
+    page_sizes, placements = pack({name: (image.width, image.height) for name, image in images.items()},
+                                  max_size, padding)
+    pages = compose(images, page_sizes, placements)
+    logger.info(f"Packed {len(names)} images into {len(pages)} atlas page(s), "
+                f"{_occupancy(pages, placements):.0%} occupied")
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        page_names = [f'atlas-{i}.png' for i in range(len(pages))]
+        for page, page_name in zip(pages, page_names):
+            page.save(os.path.join(cache_dir, page_name))
+        with open(layout_path, 'w') as file:
+            json.dump({'key': key, 'pages': page_names, 'placements': placements}, file)
+    except OSError as e:
+        logger.warning(f"Could not write atlas cache to {cache_dir}: {e}")
+    return pages, placements
+
+
+def load_atlas(names: List[str], cache_dir: Optional[str] = None, max_size: int = 2048, padding: int = 0) -> Atlas:
+    """Atlas of the named resource images, see read_atlas."""
+    return Atlas(*read_atlas(names, cache_dir, max_size, padding))
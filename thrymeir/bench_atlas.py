@@ -0,0 +1,84 @@
+"""
+Texture binds per frame of the level drawn with the spritesheets as separate textures against packed into the atlas.
+Every bind is counted, and so is every switch (a bind of a different texture than the one bound before).
+
+Run from this directory: python bench_atlas.py [creatures] [--headless]
+"""
+import sys
+import time
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+from pyglet import gl
+
+import level  # Imported before app, for the sake of their import cycle.
+import app
+import headless
+import states
+
+
+class BindCounter:
+    """Wraps glBindTexture where pyglet's groups and images call it."""
+
+    modules = (pyglet.graphics, pyglet.sprite, pyglet.image)
+
+    def __init__(self):
+        self.binds = self.switches = 0
+        self._bound = None
+        self._original = gl.glBindTexture
+        for module in self.modules:
+            module.glBindTexture = self.bind
+
+    def bind(self, target, texture):
+        self.binds += 1
+        if texture != self._bound:
+            self.switches += 1
+            self._bound = texture
+        self._original(target, texture)
+
+    def reset(self):
+        self.binds = self.switches = 0
+        self._bound = None
+
+
+def measure(a, creature_count, counter, frames):
+    lvl = level.Level(a)
+    a.state_manager = states.StateManager(lvl)
+    headless.spawn_creatures(lvl.room, creature_count)
+    a.on_draw()  # Warm up, so the tiles are uploaded before timing.
+
+    counter.reset()
+    start = time.perf_counter()
+    for _ in range(frames):
+        a.on_draw()
+        gl.glFinish()
+        a.flip()
+    elapsed = time.perf_counter() - start
+    return counter.binds / frames, counter.switches / frames, elapsed / frames
+
+
+def main(creature_count=200, frames=100):
+    a = app.App()
+    a.poll_loading(wait=True)
+    counter = BindCounter()
+    print(f"{gl.gl_info.get_renderer()}, {creature_count} creatures, {frames} frames per measurement")
+    print(f"Atlas: {len(a.atlas.textures)} page(s) of "
+          f"{', '.join(f'{t.width}x{t.height}' for t in a.atlas.textures)}, {a.atlas.occupancy:.0%} occupied")
+
+    a.entities_image = pyglet.resource.image('entities.png', atlas=False)
+    a.tileset_image = pyglet.resource.image('tileset.png', atlas=False)
+    separate = measure(a, creature_count, counter, frames)
+
+    a.entities_image, a.tileset_image = a.atlas['entities.png'], a.atlas['tileset.png']
+    packed = measure(a, creature_count, counter, frames)
+
+    print(f"{'textures':>9} {'binds/frame':>12} {'switches/frame':>15} {'ms/frame':>9}")
+    for name, (binds, switches, frame_time) in (('separate', separate), ('atlas', packed)):
+        print(f"{name:>9} {binds:>12.1f} {switches:>15.1f} {frame_time * 1000:>9.3f}")
+    a.close()
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    main(*map(int, args))
@@ -0,0 +1,80 @@
+"""
+Entity-vs-entity overlaps with the sweep and prune broad phase, against checking all pairs with
+rectangular_logic.is_collision, for growing numbers of 16x16 entities wandering a room sized to keep their density
+constant. Reports ms per tick of the broad phase (events included) and of all pairs (in Python, up to a thousand
+entities), whether both found the same pairs, and the events of the last tick. No window or GL context is needed.
+
+Run from this directory: python bench_broad_phase.py [entities...]
+"""
+import itertools
+import random
+import statistics
+import sys
+import time
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import room  # Imported before entity, for the sake of their import cycle.
+import entity
+import rectangular_logic
+from bench_collision import BenchRoom
+
+
+class Mover(entity.Entity):
+    overlaps = True
+
+
+def build(count, seed=0, area_per_entity=1024):
+    rng = random.Random(seed)
+    r = BenchRoom()
+    side = (count * area_per_entity) ** 0.5
+    movers = [Mover(r, rng.uniform(0, side), rng.uniform(0, side), 16, 16) for _ in range(count)]
+    return r, movers, side
+
+
+def wander(movers, rng, side, speed=4.0):
+    for e in movers:
+        e.x = min(max(e.x + rng.uniform(-speed, speed), 0), side)
+        e.y = min(max(e.y + rng.uniform(-speed, speed), 0), side)
+
+
+def all_pairs(movers):
+    found = set()
+    for a, b in itertools.combinations(movers, 2):
+        if rectangular_logic.is_collision(a.x, a.y, a.w, a.h, b.x, b.y, b.w, b.h):
+            found.add(frozenset((a, b)))
+    return found
+
+
+def measure(count, ticks):
+    r, movers, side = build(count)
+    rng = random.Random(1)
+    broad, naive, same = [], [], True
+    for _ in range(ticks):
+        wander(movers, rng, side)
+        start = time.perf_counter()
+        r.update_overlaps()
+        broad.append(time.perf_counter() - start)
+        if count <= 1000:
+            start = time.perf_counter()
+            found = all_pairs(movers)
+            naive.append(time.perf_counter() - start)
+            same = same and found == {frozenset(pair) for pair in r.broad_phase.pairs.values()}
+    bp = r.broad_phase
+    return (statistics.median(broad), statistics.median(naive) if naive else None, same if naive else None,
+            len(bp.pairs), len(bp.entered), len(bp.exited))
+
+
+def main(*counts, ticks=20):
+    print(f"Median ms per tick over {ticks} ticks, about one 16x16 entity per 32x32 pixels")
+    print(f"{'entities':>9} {'sweep & prune':>14} {'all pairs':>10} {'same pairs':>11} {'overlapping':>12} "
+          f"{'entered':>8} {'exited':>7}")
+    for n in counts or (100, 1000, 3000, 10000):
+        broad, naive, same, overlapping, entered, exited = measure(n, ticks)
+        print(f"{n:>9} {broad * 1000:>14.3f} {'-' if naive is None else f'{naive * 1000:.3f}':>10} "
+              f"{'-' if same is None else str(same):>11} {overlapping:>12} {entered:>8} {exited:>7}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,67 @@
+"""
+Per-tick cost of creature-vs-wall collision as the number of walls in a room grows.
+
+Run from this directory: python bench_collision.py
+"""
+import random
+import time
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import creature
+import entity
+import broad_phase
+import room
+import spatial_hash
+
+
+class BenchRoom(room.Room):
+    # Bare room without a level or textures, only what creatures need to move around.
+    def __init__(self):
+        self.walls = set()
+        self.wall_grid = spatial_hash.SpatialHash(self.cell_size)
+        self.to_update = set()
+        self.to_draw = set()
+        self.entity_store = None
+        self.broad_phase = broad_phase.SweepAndPrune()
+
+
+class BruteForceRoom(BenchRoom):
+    # What handle_movement did before the wall grid: test every wall in the room.
+    def walls_near(self, x, y, w, h):
+        return self.walls
+
+
+def build(room_type, wall_count, creature_count, seed=0):
+    rng = random.Random(seed)
+    r = room_type()
+    # Keep wall density constant (about a quarter of the tiles) so the map grows with the wall count.
+    side = max(8, int((4 * wall_count) ** 0.5))
+    tiles = rng.sample([(c, w) for c in range(side) for w in range(side)], wall_count)
+    for c, w in tiles:
+        r.add_wall(entity.Entity(r, c * 16, w * 16, 16, 16))
+    for _ in range(creature_count):
+        c = creature.Creature(r, rng.uniform(0, side * 16), rng.uniform(0, side * 16), 16, 16, None)
+        c.walking_n, c.walking_e, c.walking_s, c.walking_w = (rng.random() < 0.5 for _ in range(4))
+    return r
+
+
+def time_ticks(r, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        r.update()
+    return (time.perf_counter() - start) / ticks
+
+
+def main(wall_counts=(100, 400, 1600, 6400), creature_count=50, ticks=60):
+    print(f"{creature_count} creatures, {ticks} ticks per measurement")
+    print(f"{'walls':>8} {'grid ms/tick':>14} {'scan ms/tick':>14}")
+    for n in wall_counts:
+        grid = time_ticks(build(BenchRoom, n, creature_count), ticks)
+        scan = time_ticks(build(BruteForceRoom, n, creature_count), ticks)
+        print(f"{n:>8} {grid * 1000:>14.3f} {scan * 1000:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Frame time of drawing entities: per-entity sort and blit (the old Room.draw) against DepthSortedBatch.
+A tenth of the entities move every frame, so the batch also pays for re-sorting the ones that changed y.
+
+Run from this directory: python bench_draw.py [--headless]
+"""
+import random
+import sys
+import time
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+pyglet.options['shadow_window'] = False
+from pyglet import gl
+
+from bench_collision import BenchRoom  # Imports the game modules in an order their import cycle allows.
+import entity
+import sprite_batch
+
+
+def build(count, texture, seed=0):
+    rng = random.Random(seed)
+    r = BenchRoom()
+    region = pyglet.image.TextureRegion(0, 0, 0, 16, 32, texture)
+    for _ in range(count):
+        entity.Entity(r, rng.uniform(0, 240), rng.uniform(0, 224), 16, 16, region)
+    return r, rng
+
+
+def wiggle(entities, rng):
+    for e in entities[::10]:
+        e.y = min(224, max(0, e.y + rng.choice((-1, 1))))
+
+
+def draw_blit(r):
+    entities = list(r.to_draw)
+    entities.sort(key=lambda e: e.y)
+    for e in entities:
+        e.texture_region.blit(int(e.x), int(e.y))
+
+
+def frame_time(window, r, rng, draw, frames):
+    moving = list(r.to_draw)
+    draw(r)  # Warm up, so the batch isn't timed creating its sprites.
+    start = time.perf_counter()
+    for _ in range(frames):
+        window.switch_to()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        wiggle(moving, rng)
+        draw(r)
+        gl.glFinish()
+        window.flip()
+    return (time.perf_counter() - start) / frames
+
+
+def main(counts=(100, 1000, 10000), frames=30):
+    window = pyglet.window.Window(256, 256, visible=False)
+    pyglet.resource.path = ['res/img']
+    pyglet.resource.reindex()
+    texture = pyglet.resource.image('entities.png')
+    gl.glEnable(gl.GL_BLEND)
+    gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    print(f"{gl.gl_info.get_renderer()}, {frames} frames per measurement")
+    print(f"{'sprites':>8} {'blit ms/frame':>14} {'batch ms/frame':>15}")
+    for n in counts:
+        blit = frame_time(window, *build(n, texture), draw_blit, frames)
+
+        batch = sprite_batch.DepthSortedBatch()
+        def draw_batch(r):
+            batch.sync(r.to_draw)
+            batch.draw()
+        batched = frame_time(window, *build(n, texture), draw_batch, frames)
+
+        print(f"{n:>8} {blit * 1000:>14.3f} {batched * 1000:>15.3f}")
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Batched EntityStore.step against the scalar Creature.handle_movement path.
+Both start from the same creatures and walls; the final positions are compared before the timings are printed.
+
+Run from this directory: python bench_entity_store.py
+"""
+import random
+import time
+
+import numpy as np
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import creature
+import entity
+import entity_store
+from bench_collision import BenchRoom
+
+
+def build(creature_count, stored, seed=0, side=64):
+    rng = random.Random(seed)
+    r = BenchRoom()
+    if stored:
+        r.entity_store = entity_store.EntityStore(r)
+
+    tiles = [(c, w) for c in range(side) for w in range(side)]
+    rng.shuffle(tiles)
+    wall_tiles, free_tiles = tiles[:len(tiles) // 8], tiles[len(tiles) // 8:]
+    for c, w in wall_tiles:
+        r.add_wall(entity.Entity(r, c * 16, w * 16, 16, 16))
+
+    for c, w in free_tiles[:creature_count]:
+        if stored:
+            e = entity_store.StoredCreature(r.entity_store, r, c * 16, w * 16, 16, 16, None)
+        else:
+            e = creature.Creature(r, c * 16, w * 16, 16, 16, None)
+        e.walking_n, e.walking_e, e.walking_s, e.walking_w = (rng.random() < 0.5 for _ in range(4))
+    return r
+
+
+def positions(r):
+    if r.entity_store is not None:
+        entities = [e for e in r.entity_store.entities if e is not None]
+    else:
+        entities = list(r.to_update)
+    return np.array(sorted((e.x, e.y) for e in entities))
+
+
+def time_ticks(r, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        r.update()
+    return (time.perf_counter() - start) / ticks
+
+
+def main(creature_counts=(100, 1000, 3000), ticks=30):
+    print(f"{ticks} ticks per measurement")
+    print(f"{'creatures':>10} {'scalar ms/tick':>15} {'store ms/tick':>14} {'same positions':>15}")
+    for n in creature_counts:
+        scalar, stored = build(n, stored=False), build(n, stored=True)
+        scalar_time, stored_time = time_ticks(scalar, ticks), time_ticks(stored, ticks)
+        same = np.allclose(positions(scalar), positions(stored))
+        print(f"{n:>10} {scalar_time * 1000:>15.3f} {stored_time * 1000:>14.3f} {str(same):>15}")
+
+
+if __name__ == '__main__':
+    main()
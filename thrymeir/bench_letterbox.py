@@ -0,0 +1,47 @@
+"""
+Frame time of the letterboxed level at large window sizes: the scene drawn into the back buffer and copied into the
+scene texture (the old LetterboxViewport) against drawn straight into it through a framebuffer object.
+
+Run from this directory: python bench_letterbox.py [--headless]
+"""
+import sys
+import time
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+from pyglet import gl
+
+import level  # Imported before app, for the sake of their import cycle.
+import app
+import letterbox
+
+
+def frame_time(a, window, use_fbo, frames):
+    window.switch_to()
+    a.letterbox = letterbox.LetterboxViewport(window, a.scene_width, a.scene_height, use_fbo=use_fbo)
+    a.on_draw()  # Warm up.
+    start = time.perf_counter()
+    for _ in range(frames):
+        a.on_draw()
+        gl.glFinish()
+        window.flip()
+    return (time.perf_counter() - start) / frames
+
+
+def main(sizes=((256, 256), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)), frames=100):
+    a = app.App()
+    a.poll_loading(wait=True)
+    print(f"{gl.gl_info.get_renderer()}, {frames} frames per measurement")
+    print(f"{'window':>10} {'copy ms/frame':>14} {'fbo ms/frame':>13}")
+    for width, height in sizes:
+        window = pyglet.window.Window(width, height, visible=False)
+        copied = frame_time(a, window, False, frames)
+        fbo = frame_time(a, window, True, frames)
+        print(f"{f'{width}x{height}':>10} {copied * 1000:>14.3f} {fbo * 1000:>13.3f}")
+        window.close()
+    a.close()
+
+
+if __name__ == '__main__':
+    main()
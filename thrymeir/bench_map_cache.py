@@ -0,0 +1,88 @@
+"""
+Load time of a map: parsed by pytmx with its colliders merged (what loading a room used to cost without the collider
+cache), compiled into the map cache from the sources, and mapped from the up-to-date compiled file.
+The large maps are the demo map's layers repeated scale by scale times. No window or GL context is needed.
+
+Run from this directory: python bench_map_cache.py [scales...]
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyglet
+pyglet.options['shadow_window'] = False
+import pytmx
+
+import colliders
+import map_cache
+
+source_dir = os.path.join('res', 'lvl')
+
+
+def repeated_map(directory, scale):
+    """Path of a copy of the demo map with its layers repeated scale by scale times, next to a copy of its tileset."""
+    with open(os.path.join(source_dir, 'demo.tmx')) as file:
+        source = file.read()
+    shutil.copy(os.path.join(source_dir, 'tileset.tsx'), directory)
+
+    def repeat(match):
+        rows = [row.rstrip(',') for row in match.group(2).strip().splitlines()]
+        data = np.tile(np.array([row.split(',') for row in rows], dtype=np.int64), (scale, scale))
+        return match.group(1) + ',\n'.join(','.join(map(str, row)) for row in data) + '\n' + match.group(3)
+
+    width, height = (int(re.search(rf'<map [^>]*\b{name}="(\d+)"', source).group(1)) for name in ('width', 'height'))
+    source = re.sub(r'(<data encoding="csv">)(.*?)(</data>)', repeat, source, flags=re.S)
+    source = re.sub(r'(<(?:map|layer) [^>]*\bwidth=")\d+', rf'\g<1>{width * scale}', source)
+    source = re.sub(r'(<(?:map|layer) [^>]*\bheight=")\d+', rf'\g<1>{height * scale}', source)
+    path = os.path.join(directory, f'demo-{scale}.tmx')
+    with open(path, 'w') as file:
+        file.write(source)
+    return path
+
+
+def parse(path, cache_dir):
+    tiled_map = pytmx.TiledMap(path)
+    return tiled_map, colliders.wall_rects(tiled_map)
+
+
+def compile_cold(path, cache_dir):
+    for name in os.listdir(cache_dir):
+        os.remove(os.path.join(cache_dir, name))
+    return map_cache.load_map(path, cache_dir)
+
+
+def load_warm(path, cache_dir):
+    return map_cache.load_map(path, cache_dir)
+
+
+def timed(load, path, cache_dir, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load(path, cache_dir)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(*scales):
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, 'cache')
+        os.mkdir(cache_dir)
+        print(f"{'cells':>9} {'tmx KiB':>8} {'compiled KiB':>13} {'pytmx ms':>9} {'compile ms':>11} {'mapped ms':>10} "
+              f"{'speedup':>8}")
+        for scale in scales or (1, 8, 32):
+            path = repeated_map(directory, scale)
+            parsed = timed(parse, path, cache_dir)
+            compiled = timed(compile_cold, path, cache_dir)
+            mapped = timed(load_warm, path, cache_dir)
+            m = load_warm(path, cache_dir)
+            print(f"{m.width * m.height:>9} {os.path.getsize(path) / 1024:>8.0f} {m.nbytes / 1024:>13.0f} "
+                  f"{parsed * 1000:>9.2f} {compiled * 1000:>11.2f} {mapped * 1000:>10.3f} {parsed / mapped:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
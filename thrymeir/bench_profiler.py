@@ -0,0 +1,83 @@
+"""
+Overhead of the frame profiler: the cost of one scope while the profiler is disabled and enabled, next to an empty with
+block, then headless ticks per second of the demo level with creatures, with the profiler disabled and enabled, and what
+it recorded (phases per tick, and the size of the Chrome trace export). No window or GL context is needed.
+
+Run from this directory: python bench_profiler.py [creatures] [ticks]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import headless
+import profiling
+
+
+def per_call(body, n=200000):
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        body(n)
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def bare(n):
+    null = contextlib.nullcontext()
+    for _ in range(n):
+        with null:
+            pass
+
+
+def scoped(n):
+    for _ in range(n):
+        with profiling.scope('bench'):
+            pass
+
+
+def ticks_per_s(a, ticks, repeat=5):
+    # Alternating, so that both settings see the same noise.
+    best = {False: 0.0, True: 0.0}
+    for _ in range(repeat):
+        for enabled in best:
+            profiling.profiler.enable(enabled)
+            best[enabled] = max(best[enabled], ticks / a.timestep.run(ticks))
+    profiling.profiler.enable(False)
+    return best[False], best[True]
+
+
+def main(creatures=100, ticks=2000):
+    p = profiling.profiler
+    empty = per_call(bare)
+    p.enable(False)
+    disabled = per_call(scoped)
+    p.enable(True)
+    enabled = per_call(scoped)
+    p.enable(False)
+    print(f"empty with block {empty * 1e9:.0f} ns, scope disabled {disabled * 1e9:.0f} ns, "
+          f"enabled {enabled * 1e9:.0f} ns")
+
+    a, lvl, _ = headless.build_level(creatures)
+    a.timestep.run(60)
+    off, on = ticks_per_s(a, ticks)
+    print(f"{creatures} creatures: {off:.0f} ticks/s disabled, {on:.0f} ticks/s enabled "
+          f"({(off / on - 1) * 100:+.1f}% time per tick)")
+
+    # Every tick as a frame, so the phases read as time per tick.
+    p.enable(True)
+    for _ in range(p.capacity):
+        p.begin_frame()
+        a.timestep.run(1)
+    p.begin_frame()
+    print(', '.join(f"{name} {mean * 1000:.3f} ms" for name, (mean, _) in p.phase_times().items()))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'trace.json')
+        p.export_chrome_trace(path)
+        print(f"trace of {len(p.frames)} frames, {len(p.records)} scopes: {os.path.getsize(path) / 1024:.0f} KiB")
+    p.enable(False)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,58 @@
+"""
+Room streaming: the player walks back and forth through the door between the two demo rooms, headless but paced at the
+game's tick rate, so that the neighbour has as long to load as it would while playing. Every tick that crosses into the
+other room is timed. Reports the median and worst ms of those ticks against all other ticks, and for how many ticks the
+player stood past a room's edge waiting for the neighbour to be built (none, if prefetching kept up). No window or GL
+context is needed.
+
+Run from this directory: python bench_rooms.py [crossings]
+"""
+import statistics
+import sys
+import time
+
+import pyglet
+pyglet.options['shadow_window'] = False
+from pyglet.window import key
+
+import headless
+
+
+def steer(a, p, x, y):
+    keys = a.key_state
+    keys[key.RIGHT], keys[key.LEFT] = p.x < x - 1, p.x > x + 1
+    keys[key.UP], keys[key.DOWN] = p.y < y - 1, p.y > y + 1
+
+
+def main(crossings=20, max_ticks=600):
+    a, lvl, _ = headless.build_level()
+    a.scripts.clear()
+    p = lvl.player
+    # Out of the spawn room's east door, then back in through the other room's west door, and so on.
+    targets = {'demo.tmx': (280, 120), 'demo-east.tmx': (-24, 120)}
+    crossing_ticks, other_ticks, waiting = [], [], 0
+    for _ in range(crossings):
+        start_room = lvl.room
+        for _ in range(max_ticks):
+            steer(a, p, *targets[start_room.name])
+            start = time.perf_counter()
+            a.on_update(1 / a.tps)
+            elapsed = time.perf_counter() - start
+            time.sleep(max(0.0, 1 / a.tps - elapsed))
+            if lvl.room is not start_room:
+                crossing_ticks.append(elapsed)
+                break
+            other_ticks.append(elapsed)
+            waiting += not 0 <= p.x + p.w / 2 < start_room.width
+        else:
+            raise RuntimeError(f"The player didn't leave room {start_room.name} in {max_ticks} ticks")
+    lvl.close()
+
+    print(f"{crossings} crossings between {' and '.join(targets)}, {waiting} ticks waiting past an edge")
+    print(f"{'ticks':>10} {'count':>6} {'median ms':>10} {'max ms':>8}")
+    for name, times in (('crossing', crossing_ticks), ('other', other_ticks)):
+        print(f"{name:>10} {len(times):>6} {statistics.median(times) * 1000:>10.3f} {max(times) * 1000:>8.3f}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
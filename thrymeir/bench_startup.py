@@ -0,0 +1,85 @@
+"""
+Startup time, measured in fresh processes: how long importing app takes and what it imports, and the time from
+launching the game to its first frame and to the level being loaded. Frames go through pyglet's event loop, one
+EventLoop.idle() per iteration as pyglet.app.run() does it, so scheduled functions run before each frame is drawn.
+Run it before and after changes to startup, so regressions show.
+
+Run from this directory: python bench_startup.py [runs] [--headless]
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+headless = '--headless' in sys.argv
+
+startup_script = f"""
+import json, time
+start = time.time()
+import pyglet
+pyglet.options['headless'] = {headless}
+import app
+imported = time.time()
+a = app.App()
+created = time.time()
+loop = pyglet.app.event_loop
+loop._legacy_setup()  # As EventLoop.run() does first, so that windows dispatch on_draw rather than queue it.
+loop.idle()
+first_frame = time.time()
+frames = 1
+# Apps from before the level loaded in the background have it loaded by now.
+while getattr(a, 'level', None) is None:
+    time.sleep(0.001)
+    loop.idle()
+    frames += 1
+loaded = time.time()
+loop.idle()
+print(json.dumps({{'start': start, 'imported': imported, 'created': created, 'first_frame': first_frame,
+                  'loaded': loaded, 'level_frame': time.time(), 'frames': frames}}))
+"""
+
+import_script = f"import pyglet; pyglet.options['headless'] = {headless}; import app"
+watched = ('numpy', 'pytmx', 'level', 'room', 'map_cache')
+
+
+def startup():
+    launched = time.time()
+    out = subprocess.run([sys.executable, '-c', startup_script], capture_output=True, text=True, check=True).stdout
+    times = json.loads(out.splitlines()[-1])
+    return {
+        'interpreter': times['start'] - launched,
+        'imports': times['imported'] - times['start'],
+        'app created': times['created'] - launched,
+        'first frame': times['first_frame'] - launched,
+        'level loaded': times['loaded'] - launched,
+        'level frame': times['level_frame'] - launched,
+        'menu frames': times['frames'],
+    }
+
+
+def import_times():
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', import_script],
+                         capture_output=True, text=True, check=True).stderr
+    modules = {}
+    for line in err.splitlines():
+        if line.startswith('import time:') and '|' in line and 'self' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def main(runs=5):
+    modules = import_times()
+    print(f"import app: {modules.get('app', 0) * 1000:.1f} ms, {len(modules)} modules; "
+          + ', '.join(f"{name} {'imported' if name in modules else 'not imported'}" for name in watched))
+
+    results = [startup() for _ in range(runs)]
+    print(f"Median of {runs} launches, in seconds since launch except for how long imports took")
+    for key in results[0]:
+        value = statistics.median(r[key] for r in results)
+        print(f"{key:>13} {value:>8.0f}" if key == 'menu frames' else f"{key:>13} {value:>8.3f}")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:] if not arg.startswith('--')])
@@ -0,0 +1,97 @@
+"""
+Headless simulation benchmark suite, runnable on a machine without a display.
+
+For each creature count (scalar creatures, and stored in an EntityStore) the demo level is built headlessly and
+reports: load time and memory, ticks per second, per-phase time per tick, and memory allocated while ticking.
+
+Run from this directory: python bench_suite.py [--ticks N] [--creatures 10 100 1000] [--json results.json]
+"""
+import argparse
+import collections
+import json
+import time
+import tracemalloc
+
+import headless
+
+
+class PhaseTimer:
+    """Accumulates the time spent in methods it wraps, per named phase."""
+
+    def __init__(self):
+        self.totals = collections.Counter()
+
+    def wrap(self, obj, name: str, phase: str) -> None:
+        method = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.totals[phase] += time.perf_counter() - start
+        setattr(obj, name, timed)
+
+
+def measure(creature_count: int, stored: bool, ticks: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    a, lvl, _ = headless.build_level(creature_count, stored)
+    load_time = time.perf_counter() - start
+    load_memory = tracemalloc.get_traced_memory()[0]
+
+    # Memory allocated while ticking (garbage included), then throughput without tracing slowing it down.
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    a.timestep.run(60)
+    tick_peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    elapsed = a.timestep.run(ticks)
+
+    # Per-phase timings in a separate run, as the timers themselves cost something.
+    timer = PhaseTimer()
+    r = lvl.room
+    timer.wrap(lvl, 'update', 'level update')
+    timer.wrap(r, 'walls_near', 'wall queries')
+    if r.entity_store is not None:
+        timer.wrap(r.entity_store, 'step', 'entity store step')
+    a.timestep.run(ticks)
+
+    return {
+        'creatures': creature_count,
+        'stored': stored,
+        'ticks': ticks,
+        'load_s': load_time,
+        'load_memory_bytes': load_memory,
+        'tick_peak_memory_bytes': tick_peak,
+        'ticks_per_s': ticks / elapsed,
+        'phase_ms_per_tick': {phase: total / ticks * 1000 for phase, total in timer.totals.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--creatures', type=int, nargs='+', default=[0, 100, 1000])
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'creatures':>10} {'store':>6} {'load ms':>8} {'load KiB':>9} {'tick KiB':>9} {'ticks/s':>9}  phases ms/tick")
+    for count in args.creatures:
+        for stored in (False, True):
+            result = measure(count, stored, args.ticks)
+            results.append(result)
+            phases = ', '.join(f"{phase} {ms:.3f}" for phase, ms in result['phase_ms_per_tick'].items())
+            print(f"{count:>10} {str(stored):>6} {result['load_s'] * 1000:>8.1f} "
+                  f"{result['load_memory_bytes'] / 1024:>9.0f} {result['tick_peak_memory_bytes'] / 1024:>9.1f} "
+                  f"{result['ticks_per_s']:>9.0f}  {phases}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
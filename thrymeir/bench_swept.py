@@ -0,0 +1,175 @@
+"""
+Swept collision of creatures against walls, compared with the discrete overlap check it replaced, for scalar creatures
+and for the batched EntityStore step:
+- ms per tick in a room of tile walls, and whether the scalar and batched paths end at the same positions;
+- how many fast creatures walking into thin walls end up past them;
+- whether the result changes when the same walls are created in another order (a set's iteration order follows the
+  walls' hashes, and the discrete check stopped at the first wall it found).
+No window or GL context is needed.
+
+Run from this directory: python bench_swept.py [creatures...]
+"""
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+import creature
+import entity
+import entity_store
+import rectangular_logic
+from bench_collision import BenchRoom
+
+
+class DiscreteCreature(creature.Creature):
+    # Creature.handle_movement before sweeping: move along each axis, then push out of the first wall overlapped.
+    def handle_movement(self):
+        move_x = (0, 1)[self.walking_e] + (0, -1)[self.walking_w]
+        move_y = (0, 1)[self.walking_n] + (0, -1)[self.walking_s]
+        if move_x and move_y:
+            move_x = creature.sign(move_x) * creature.INV_SQRT2
+            move_y = creature.sign(move_y) * creature.INV_SQRT2
+
+        if move_x:
+            dx = move_x * self.walking_speed
+            candidates = self.room.walls_near(min(self.x, self.x + dx), self.y, self.w + abs(dx), self.h)
+            self.x += dx
+            for wall in candidates:
+                if not rectangular_logic.is_collision(self.x, self.y, self.w, self.h, wall.x, wall.y, wall.w, wall.h):
+                    continue
+                self.x = wall.x - self.w if move_x > 0 else wall.x + wall.w
+                break
+
+        if move_y:
+            dy = move_y * self.walking_speed
+            candidates = self.room.walls_near(self.x, min(self.y, self.y + dy), self.w, self.h + abs(dy))
+            self.y += dy
+            for wall in candidates:
+                if not rectangular_logic.is_collision(self.x, self.y, self.w, self.h, wall.x, wall.y, wall.w, wall.h):
+                    continue
+                self.y = wall.y - self.h if move_y > 0 else wall.y + wall.h
+
+
+class DiscreteStore(entity_store.EntityStore):
+    # EntityStore.step before sweeping, with the per-axis WallGrid.resolve.
+    def step(self):
+        idx = np.flatnonzero(self.moving)
+        if not len(idx):
+            return
+        self.last_x[idx], self.last_y[idx] = self.x[idx], self.y[idx]
+        walking = self.walking[idx]
+        move_x = walking[:, 1].astype(float) - walking[:, 3]
+        move_y = walking[:, 0].astype(float) - walking[:, 2]
+        diagonal = (move_x != 0) & (move_y != 0)
+        move_x[diagonal] *= creature.INV_SQRT2
+        move_y[diagonal] *= creature.INV_SQRT2
+
+        speed, w, h = self.walking_speed[idx], self.w[idx], self.h[idx]
+        x = self.walls.resolve(self.x[idx] + move_x * speed, self.y[idx], w, h, move_x, axis=0)
+        y = self.walls.resolve(self.y[idx] + move_y * speed, x, h, w, move_y, axis=1)
+        self.x[idx], self.y[idx] = x, y
+
+
+# (creature type, store type) of each way of moving creatures.
+paths = {
+    'discrete': (DiscreteCreature, None),
+    'swept': (creature.Creature, None),
+    'discrete store': (None, DiscreteStore),
+    'swept store': (None, entity_store.EntityStore),
+}
+
+
+def populate(path, walls, creatures):
+    """A room with the walls (x, y, w, h) and creatures (x, y, speed, walking flags N, E, S, W)."""
+    creature_type, store_type = paths[path]
+    r = BenchRoom()
+    if store_type is not None:
+        r.entity_store = store_type(r)
+    for x, y, w, h in walls:
+        r.add_wall(entity.Entity(r, x, y, w, h))
+    for x, y, speed, walking in creatures:
+        if store_type is not None:
+            c = entity_store.StoredCreature(r.entity_store, r, x, y, 16, 16, None)
+        else:
+            c = creature_type(r, x, y, 16, 16, None)
+        c.walking_speed = speed
+        c.walking_n, c.walking_e, c.walking_s, c.walking_w = walking
+    return r
+
+
+def positions(r):
+    entities = [e for e in r.entity_store.entities if e is not None] if r.entity_store is not None else r.to_update
+    return np.array(sorted((e.x, e.y) for e in entities))
+
+
+def run(r, ticks):
+    # Median tick time, which this machine's noise moves less than the mean.
+    times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        r.update()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def tile_scene(creature_count, rng, side=64):
+    # As in bench_entity_store: an eighth of the tiles are walls, creatures start on free tiles.
+    tiles = [(c, r) for c in range(side) for r in range(side)]
+    rng.shuffle(tiles)
+    walls = [(c * 16, r * 16, 16, 16) for c, r in tiles[:len(tiles) // 8]]
+    creatures = [(c * 16, r * 16, 10.0, tuple(rng.random() < 0.5 for _ in range(4)))
+                 for c, r in tiles[len(tiles) // 8:][:creature_count]]
+    return walls, creatures
+
+
+def thin_wall_scene(creature_count, rng):
+    # Creatures walking east at 24 px per tick towards 4 px thick walls every 64 px.
+    walls = [(x, 0, 4, 4096) for x in range(128, 4096, 64)]
+    creatures = [(rng.uniform(0, 100), rng.uniform(0, 4000), 24.0, (False, True, False, False))
+                 for _ in range(creature_count)]
+    return walls, creatures
+
+
+def scattered_scene(creature_count, rng, side=1024):
+    # Walls of assorted sizes off the grid, so a creature can overlap several at different positions at once.
+    walls = [(rng.uniform(0, side), rng.uniform(0, side), rng.uniform(4, 24), rng.uniform(4, 24)) for _ in range(1500)]
+    creatures = [(rng.uniform(0, side), rng.uniform(0, side), rng.uniform(5, 20),
+                  tuple(rng.random() < 0.5 for _ in range(4))) for _ in range(creature_count)]
+    return walls, creatures
+
+
+def main(*creature_counts, ticks=30):
+    print(f"Median ms per tick over {ticks} ticks, in a 64x64 tile room with an eighth of its tiles walls")
+    print(f"{'creatures':>10}" + ''.join(f"{path:>16}" for path in paths) + f"{'same positions':>16}")
+    for n in creature_counts or (100, 1000, 3000):
+        walls, creatures = tile_scene(n, random.Random(0))
+        rooms = {path: populate(path, walls, creatures) for path in paths}
+        times = {path: run(r, ticks) for path, r in rooms.items()}
+        same = np.array_equal(positions(rooms['swept']), positions(rooms['swept store']))
+        print(f"{n:>10}" + ''.join(f"{times[path] * 1000:>16.3f}" for path in paths) + f"{str(same):>16}")
+
+    walls, creatures = thin_wall_scene(1000, random.Random(0))
+    print(f"\nOf {len(creatures)} creatures walking at 24 px per tick into 4 px walls, ended past the first wall:")
+    for path in paths:
+        r = populate(path, walls, creatures)
+        run(r, ticks)
+        print(f"{path:>16} {int((positions(r)[:, 0] > 128).sum()):>6}")
+
+    walls, creatures = scattered_scene(1000, random.Random(0))
+    shuffled = walls[:]
+    random.Random(1).shuffle(shuffled)
+    print(f"\nOf {len(creatures)} creatures among {len(walls)} scattered walls, created in two orders, ended elsewhere:")
+    for path in paths:
+        first, second = populate(path, walls, creatures), populate(path, shuffled, creatures)
+        run(first, ticks)
+        run(second, ticks)
+        print(f"{path:>16} {int((positions(first) != positions(second)).any(axis=1).sum()):>6}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
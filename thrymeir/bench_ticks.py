@@ -0,0 +1,27 @@
+"""
+Simulation throughput: runs the game's fixed-step update as fast as possible, without drawing.
+
+Run from this directory: python bench_ticks.py [ticks] [--headless]
+"""
+import sys
+
+import pyglet
+if '--headless' in sys.argv:
+    pyglet.options['headless'] = True
+
+import level  # Imported before app, for the sake of their import cycle.
+import app
+
+
+def main(ticks=10000):
+    a = app.App()
+    a.poll_loading(wait=True)
+    elapsed = a.timestep.run(ticks)
+    print(f"{ticks} ticks in {elapsed:.3f} s: {ticks / elapsed:.0f} ticks/s "
+          f"({ticks / elapsed / a.tps:.1f}x real time at {a.tps} tps)")
+    a.close()
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    main(*map(int, args))
@@ -0,0 +1,80 @@
+"""
+Load time and memory of a large map's tiles: an object with its own region and metadata per cell (the old tiles.Tile)
+against the flyweight tiles shared per GID through a TileRegistry.
+The large map is the demo map's tile layers repeated scale by scale times. No window or GL context is needed.
+
+Run from this directory: python bench_tiles.py [scale]
+"""
+import sys
+import time
+import tracemalloc
+
+import pyglet
+pyglet.options['shadow_window'] = False
+import pytmx
+
+import headless
+import tiles
+
+
+class CellTile:
+    """A tile per cell, as tiles.Tile used to be."""
+    overdraw = False
+
+    def __init__(self, col, row, region, metadata=None):
+        self.col, self.row = col, row
+        self.metadata = metadata if metadata is not None else {}
+        self.image = region
+
+
+def cells(tiled_map, scale):
+    for index in tiled_map.visible_tile_layers:
+        layer = tiled_map.layers[index]
+        for col, row, gid in layer.iter_data():
+            if gid:
+                for i in range(scale):
+                    for j in range(scale):
+                        yield col + i * tiled_map.width, row + j * tiled_map.height, gid
+
+
+def load_cell_tiles(tiled_map, texture, scale):
+    grid = {}
+    for col, row, gid in cells(tiled_map, scale):
+        _, (x, y, w, h), _ = tiled_map.images[gid]
+        region = texture.get_region(x, texture.height - y - h, w, h)
+        grid[col, row] = CellTile(col, row, region, dict(tiled_map.get_tile_properties_by_gid(gid) or {}))
+    return grid
+
+
+def load_flyweights(tiled_map, texture, scale):
+    registry = tiles.TileRegistry(tiled_map, texture)
+    return {(col, row): registry[gid] for col, row, gid in cells(tiled_map, scale)}
+
+
+def measure(load, tiled_map, texture, scale):
+    tracemalloc.start()
+    grid = load(tiled_map, texture, scale)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Timed again without tracing, which slows allocations down.
+    start = time.perf_counter()
+    load(tiled_map, texture, scale)
+    return len(grid), len({id(t) for t in grid.values()}), time.perf_counter() - start, memory
+
+
+def main(scale=16):
+    pyglet.resource.path = ['res/img', 'res/lvl']
+    pyglet.resource.reindex()
+    tiled_map = pytmx.TiledMap(pyglet.resource.location('demo.tmx').path + '/demo.tmx')
+    texture = headless.stub_texture(256, 256)
+
+    print(f"Demo map repeated {scale}x{scale} times: {tiled_map.width * scale}x{tiled_map.height * scale} cells")
+    print(f"{'tiles':>11} {'cells':>8} {'objects':>8} {'load ms':>8} {'KiB':>9}")
+    for name, load in (('per cell', load_cell_tiles), ('flyweight', load_flyweights)):
+        count, objects, elapsed, memory = measure(load, tiled_map, texture, scale)
+        print(f"{name:>11} {count:>8} {objects:>8} {elapsed * 1000:>8.1f} {memory / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""
+Entity-vs-entity overlaps, for entities that opt in (Entity.overlaps).
+
+Sweep and prune on x, within horizontal strips: every tick the members' rectangles are put in the strips they cover and
+sorted by strip and left edge, so the rectangles a member can overlap are the run of those after it in its strip that
+start before its right edge. Sweeping a whole room on x alone would pair every member with all those in its column.
+A pair is only taken from the strip holding the higher of the two bottom edges, which both rectangles cover if they
+overlap, so it's found once. Candidate pairs go through rectangular_logic.is_collision, and the overlapping pairs are
+compared with the last tick's to tell which entered, which stayed and which exited. Sorting and pairing are done with
+NumPy, so only overlapping pairs cost Python work.
+"""
+import operator
+from typing import *
+
+import numpy as np
+
+import entity
+import rectangular_logic
+
+__all__ = ['SweepAndPrune']
+
+
+Pair = Tuple['entity.Entity', 'entity.Entity']
+
+_rect = operator.attrgetter('x', 'y', 'w', 'h')
+
+
+class SweepAndPrune:
+    def __init__(self, strip_height: float = 64):
+        self.strip_height = strip_height
+        self._members: List['entity.Entity'] = []
+        self._ids: List[int] = []  # Never reused, so a pair's key outlives its entities.
+        self._index: Dict['entity.Entity', int] = {}  # Position in _members.
+        self._next_id = 0
+
+        self.pairs: Dict[int, Pair] = {}  # Overlapping pairs by key, each ordered by id.
+        self.entered: List[Pair] = []
+        self.stayed: List[Pair] = []
+        self.exited: List[Pair] = []
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, e) -> bool:
+        return e in self._index
+
+    def add(self, e: 'entity.Entity') -> None:
+        if e in self._index:
+            return
+        self._index[e] = len(self._members)
+        self._members.append(e)
+        self._ids.append(self._next_id)
+        self._next_id += 1
+
+    def remove(self, e: 'entity.Entity') -> None:
+        # Its pairs exit on the next update. Swapped with the last member, so removal doesn't shift the others.
+        i = self._index.pop(e)
+        last = self._members.pop()
+        last_id = self._ids.pop()
+        if last is not e:
+            self._members[i], self._ids[i] = last, last_id
+            self._index[last] = i
+
+    def candidates(self, x: np.ndarray, y: np.ndarray, w: np.ndarray, h: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pairs (i, j) of indices of rectangles that share a strip and whose extents on x overlap, each pair at most once.
+        Every overlapping pair is among them.
+        """
+        if not len(x):
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        first_strip = np.floor(y / self.strip_height).astype(int)
+        counts = np.floor((y + h) / self.strip_height).astype(int) - first_strip + 1
+        owner = np.repeat(np.arange(len(x)), counts)
+        strip = first_strip[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # Sorted by strip, then left edge, as one key: the strip's base plus the distance from the leftmost edge.
+        # Rounding is monotonic, so a rectangle starting before another's right edge never sorts after that edge.
+        left = x.min()
+        span = x.max() - left + w.max() + 1
+        base = (strip - strip.min()) * span
+        key = base + (x[owner] - left)
+        order = np.argsort(key, kind='stable')
+        owner, key = owner[order], key[order]
+        ends = np.searchsorted(key, base[order] + (x[owner] + w[owner] - left), side='right')
+
+        counts = ends - np.arange(len(key)) - 1
+        first = np.repeat(np.arange(len(key)), counts)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+        i, j = owner[first], owner[second]
+        home = np.floor(np.maximum(y[i], y[j]) / self.strip_height).astype(int)
+        keep = home == strip[order][first]
+        return i[keep], j[keep]
+
+    def overlapping(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairs (i, j) of indices of members that overlap now."""
+        rects = np.array([_rect(e) for e in self._members], dtype=float).reshape(-1, 4)
+        x, y, w, h = rects.T
+        i, j = self.candidates(x, y, w, h)
+        hit = rectangular_logic.is_collision(x[i], y[i], w[i], h[i], x[j], y[j], w[j], h[j])
+        return i[hit], j[hit]
+
+    def update(self) -> None:
+        """Find the overlapping pairs, and which of them entered, stayed or exited since the last update."""
+        i, j = self.overlapping()
+        ids = np.array(self._ids, dtype=np.int64)
+        swap = ids[i] > ids[j]
+        i, j = np.where(swap, j, i), np.where(swap, i, j)
+        keys = ids[i] << 32 | ids[j]
+
+        members, old = self._members, self.pairs
+        pairs = {}
+        self.entered, self.stayed = entered, stayed = [], []
+        for key, a, b in zip(keys.tolist(), i.tolist(), j.tolist()):
+            pair = old.get(key)
+            if pair is None:
+                pair = members[a], members[b]
+                entered.append(pair)
+            else:
+                stayed.append(pair)
+            pairs[key] = pair
+        self.exited = [pair for key, pair in old.items() if key not in pairs]
+        self.pairs = pairs
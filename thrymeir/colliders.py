@@ -0,0 +1,61 @@
+"""
+Wall colliders from the solid tiles of a Tiled map.
+
+One collider per tile multiplies the cost of collision checks, so solid tiles are merged greedily into few
+axis-aligned rectangles: every unclaimed solid tile starts a run extended right as far as possible, and the run is then
+extended row by row while the whole span stays solid. The result is stored in the compiled map (see map_cache.py), so
+later loads skip the merge.
+"""
+import logging
+from typing import *
+
+import pytmx
+
+__all__ = ['Rect', 'solid_tiles', 'merge_tiles', 'wall_rects']
+
+
+logger = logging.getLogger(__name__)
+
+Rect = Tuple[int, int, int, int]  # x, y, w, h
+
+
+def solid_tiles(tiled_map: pytmx.TiledMap, layer_name: str = 'walls') -> List[List[bool]]:
+    """Solid cells of a tile layer, indexed [row][col] with rows going up from the bottom of the map like game y."""
+    layer = tiled_map.get_layer_by_name(layer_name)
+    return [[bool(gid) for gid in row] for row in reversed(layer.data)]
+
+
+def merge_tiles(solid: List[List[bool]]) -> List[Rect]:
+    """Greedy row/column merge of solid cells into rectangles, in tile units."""
+    rows = len(solid)
+    cols = len(solid[0]) if rows else 0
+    claimed = [[False] * cols for _ in range(rows)]
+
+    def free(r, c):
+        return solid[r][c] and not claimed[r][c]
+
+    rects = []
+    for r in range(rows):
+        for c in range(cols):
+            if not free(r, c):
+                continue
+            w = 1
+            while c + w < cols and free(r, c + w):
+                w += 1
+            h = 1
+            while r + h < rows and all(free(r + h, c + i) for i in range(w)):
+                h += 1
+            for dr in range(h):
+                for dc in range(w):
+                    claimed[r + dr][c + dc] = True
+            rects.append((c, r, w, h))
+    return rects
+
+
+def wall_rects(tiled_map: pytmx.TiledMap, layer_name: str = 'walls') -> List[Rect]:
+    """Merged colliders of the solid tiles of a layer, in pixels."""
+    solid = solid_tiles(tiled_map, layer_name)
+    tw, th = tiled_map.tilewidth, tiled_map.tileheight
+    rects = [(c * tw, r * th, w * tw, h * th) for c, r, w, h in merge_tiles(solid)]
+    logger.info(f"Merged {sum(map(sum, solid))} solid tiles into {len(rects)} colliders")
+    return rects
@@ -21,6 +21,10 @@ class Creature(entity.Entity):
         super().register()
         self.room.to_update.add(self)
 
+    def unregister(self):
+        super().unregister()
+        self.room.to_update.discard(self)
+
     def update(self):
         self.handle_movement()
     
@@ -33,28 +37,12 @@ class Creature(entity.Entity):
             move_x = sign(move_x) * INV_SQRT2
             move_y = sign(move_y) * INV_SQRT2
 
-        if move_x:
-            self.x += move_x * self.walking_speed
-
-            for wall in self.room.walls:
-                if not rectangular_logic.is_collision(self.x, self.y, self.w, self.h, wall.x, wall.y, wall.w, wall.h):
-                    continue
-                if move_x > 0:
-                    self.x = wall.x - self.w
-                elif move_x < 0:
-                    self.x = wall.x + wall.w
-                break
-
-        if move_y:
-            self.y += move_y * self.walking_speed
-
-            for wall in self.room.walls:
-                if not rectangular_logic.is_collision(self.x, self.y, self.w, self.h, wall.x, wall.y, wall.w, wall.h):
-                    continue
-                if move_y > 0:
-                    self.y = wall.y - self.h
-                elif move_y < 0:
-                    self.y = wall.y + wall.h
+        if move_x or move_y:
+            dx, dy = move_x * self.walking_speed, move_y * self.walking_speed
+            # Only walls in the rectangle swept by this step can be hit.
+            candidates = self.room.walls_near(min(self.x, self.x + dx), min(self.y, self.y + dy),
+                                              self.w + abs(dx), self.h + abs(dy))
+            self.x, self.y = rectangular_logic.sweep(self.x, self.y, self.w, self.h, dx, dy, candidates)
 
 
 class Player(Creature):
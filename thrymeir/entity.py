@@ -6,14 +6,44 @@ import room
 
 
 class Entity:
+    overlaps = False  # Whether the room's broad phase reports overlaps with other entities that opt in too.
+
     def __init__(self, parent: 'room.Room', x: float, y: float, w: float, h: float,
                  texture_region: Optional[pyglet.image.TextureRegion] = None):
         self.room = parent
         self.x, self.y, self.w, self.h = x, y, w, h
+        self.last_x, self.last_y = x, y  # Position before the last tick, for interpolated drawing.
         self.texture_region = texture_region
 
         self.register()
 
+    def render_position(self, alpha: float) -> Tuple[float, float]:
+        return self.last_x + (self.x - self.last_x) * alpha, self.last_y + (self.y - self.last_y) * alpha
+
     def register(self):
         if self.texture_region is not None:
             self.room.to_draw.add(self)
+        if self.overlaps:
+            self.room.broad_phase.add(self)
+
+    def unregister(self):
+        self.room.to_draw.discard(self)
+        if self in self.room.broad_phase:
+            self.room.broad_phase.remove(self)
+
+    def enter_room(self, other: 'room.Room', x: float, y: float):
+        """Move to another room, at x, y in its coordinates."""
+        self.unregister()
+        self.room = other
+        self.x, self.y = self.last_x, self.last_y = x, y
+        self.register()
+
+    # Called by the room after each tick for every other entity this one started or kept overlapping, or stopped.
+    def on_overlap_enter(self, other: 'Entity'):
+        pass
+
+    def on_overlap_stay(self, other: 'Entity'):
+        pass
+
+    def on_overlap_exit(self, other: 'Entity'):
+        pass
@@ -0,0 +1,302 @@
+"""
+Optional struct-of-arrays storage for crowds of creatures.
+
+Positions, sizes, walking flags and speeds of stored entities live in contiguous NumPy arrays,
+and EntityStore.step moves all stored creatures, swept against the room's walls, in one batched pass.
+StoredEntity and StoredCreature keep the usual Entity/Creature attributes, but as views into the arrays.
+
+Usage: room.entity_store = EntityStore(room), then create StoredCreature(room.entity_store, room, ...).
+"""
+from typing import *
+
+import numpy as np
+
+import creature
+import entity
+import room
+
+__all__ = ['EntityStore', 'WallGrid', 'StoredEntity', 'StoredCreature']
+
+
+class EntityStore:
+    def __init__(self, parent: 'room.Room', capacity: int = 64):
+        self.room = parent
+
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.w = np.zeros(capacity)
+        self.h = np.zeros(capacity)
+        self.last_x = np.zeros(capacity)
+        self.last_y = np.zeros(capacity)
+        self.walking = np.zeros((capacity, 4), dtype=bool)  # N, E, S, W
+        self.walking_speed = np.zeros(capacity)
+        self.moving = np.zeros(capacity, dtype=bool)  # Slots stepped by the store.
+
+        self.entities: List[Optional['StoredEntity']] = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+        self._walls = None
+
+    def __len__(self) -> int:
+        return len(self.entities) - len(self._free)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.entities)
+
+    def allocate(self, e: 'StoredEntity') -> int:
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.entities[slot] = e
+        return slot
+
+    def release(self, slot: int) -> None:
+        self.entities[slot] = None
+        self.moving[slot] = False
+        self.walking[slot] = False
+        self._free.append(slot)
+
+    def _grow(self) -> None:
+        old = self.capacity
+        new = 2 * old
+        for name in ('x', 'y', 'w', 'h', 'last_x', 'last_y', 'walking_speed', 'moving', 'walking'):
+            array = getattr(self, name)
+            grown = np.zeros((new,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        self.entities.extend([None] * (new - old))
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def invalidate_walls(self) -> None:
+        # Room calls this whenever a wall is added or removed.
+        self._walls = None
+
+    @property
+    def walls(self) -> 'WallGrid':
+        if self._walls is None:
+            rects = np.array([(w.x, w.y, w.w, w.h) for w in self.room.walls], dtype=float).reshape(-1, 4)
+            self._walls = WallGrid(rects, self.room.cell_size)
+        return self._walls
+
+    def step(self) -> None:
+        """Batched Creature.handle_movement for every moving slot."""
+        idx = np.flatnonzero(self.moving)
+        if not len(idx):
+            return
+        self.last_x[idx] = self.x[idx]
+        self.last_y[idx] = self.y[idx]
+
+        walking = self.walking[idx]
+        move_x = walking[:, 1].astype(float) - walking[:, 3]
+        move_y = walking[:, 0].astype(float) - walking[:, 2]
+
+        # Walking diagonally.
+        diagonal = (move_x != 0) & (move_y != 0)
+        move_x[diagonal] *= creature.INV_SQRT2
+        move_y[diagonal] *= creature.INV_SQRT2
+
+        speed = self.walking_speed[idx]
+        self.x[idx], self.y[idx] = self.walls.sweep(self.x[idx], self.y[idx], self.w[idx], self.h[idx],
+                                                    move_x * speed, move_y * speed)
+
+
+def _cell_pairs(c1, r1, c2, r2, columns):
+    # For every rectangle i covering cells [c1, c2] × [r1, r2], the pairs (i, flat cell index) it touches.
+    span = c2 - c1 + 1
+    counts = np.maximum(span, 0) * np.maximum(r2 - r1 + 1, 0)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell = (r1[owner] + offset // span[owner]) * columns + c1[owner] + offset % span[owner]
+    return owner, cell
+
+
+def _entry_exit(p, size, d, wp, wsize):
+    # Times at which boxes moving by d along an axis enter and leave the walls' extent on it, as in
+    # rectangular_logic.sweep: the whole move for boxes already within it, never for the others that don't move.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entry = np.where(d > 0, wp - p - size, wp + wsize - p) / d
+        exit_ = np.where(d > 0, wp + wsize - p, wp - p - size) / d
+    still = d == 0
+    within = (p < wp + wsize) & (p + size > wp)
+    entry[still] = np.where(within[still], -np.inf, np.inf)
+    exit_[still] = np.inf
+    return entry, exit_
+
+
+class WallGrid:
+    """
+    Wall rectangles binned into a uniform grid, stored as a cell -> walls index (CSR), so that batches
+    of creatures can be tested against nearby walls only, without a Python loop.
+    """
+
+    def __init__(self, rects: np.ndarray, cell_size: float):
+        self.rects = rects
+        self.cell_size = cell_size
+        if not len(rects):
+            return
+
+        self.origin = rects[:, :2].min(axis=0)
+        c1, r1, c2, r2 = self._cell_span(rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3], clip=False)
+        self.columns, self.rows = c2.max() + 1, r2.max() + 1
+
+        wall, cell = _cell_pairs(c1, r1, c2, r2, self.columns)
+        order = np.argsort(cell, kind='stable')
+        self.cell_walls = wall[order]
+        self.cell_starts = np.searchsorted(cell[order], np.arange(self.columns * self.rows + 1))
+
+    def _cell_span(self, x, y, w, h, clip=True):
+        cs = self.cell_size
+        ox, oy = self.origin
+        c1, r1 = np.floor((x - ox) / cs).astype(int), np.floor((y - oy) / cs).astype(int)
+        c2, r2 = np.floor((x + w - ox) / cs).astype(int), np.floor((y + h - oy) / cs).astype(int)
+        if clip:
+            c1, r1 = np.maximum(c1, 0), np.maximum(r1, 0)
+            c2, r2 = np.minimum(c2, self.columns - 1), np.minimum(r2, self.rows - 1)
+        return c1, r1, c2, r2
+
+    def candidates(self, x, y, w, h):
+        """Pairs (rectangle index, wall index) of walls sharing a grid cell with each rectangle."""
+        owner, cell = _cell_pairs(*self._cell_span(x, y, w, h), self.columns)
+        starts, ends = self.cell_starts[cell], self.cell_starts[cell + 1]
+        counts = ends - starts
+        pair_owner = np.repeat(owner, counts)
+        offset = np.arange(len(pair_owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return pair_owner, self.cell_walls[np.repeat(starts, counts) + offset]
+
+    def sweep(self, x, y, w, h, dx, dy):
+        """
+        Where boxes end after moving by dx, dy, stopped by the walls and sliding along them: rectangular_logic.sweep
+        for every box at once, with the same results.
+        """
+        x, y, dx, dy = (np.array(a, dtype=float) for a in (x, y, dx, dy))
+        if not len(self.rects):
+            return x + dx, y + dy
+        moved = np.flatnonzero((dx != 0) | (dy != 0))
+        # Later parts of a move stay within the rectangle swept by the whole of it, and only walls overlapping that
+        # rectangle can be hit, not all those sharing a cell with it.
+        sx, sy, sw, sh = np.minimum(x, x + dx), np.minimum(y, y + dy), w + np.abs(dx), h + np.abs(dy)
+        i, j = self.candidates(sx[moved], sy[moved], sw[moved], sh[moved])
+        i = moved[i]
+        wx, wy, ww, wh = self.rects[j].T
+        near = (sx[i] < wx + ww) & (sx[i] + sw[i] > wx) & (sy[i] < wy + wh) & (sy[i] + sh[i] > wy)
+        i, wx, wy, ww, wh = i[near], wx[near], wy[near], ww[near], wh[near]
+
+        for _ in range(2):  # Every hit blocks an axis.
+            if not len(i):
+                break
+            tx, ex = _entry_exit(x[i], w[i], dx[i], wx, ww)
+            ty, ey = _entry_exit(y[i], h[i], dy[i], wy, wh)
+            t = np.maximum(tx, ty)
+            valid = (t >= 0) & (t <= 1) & (t < np.minimum(ex, ey))
+
+            first = np.full(len(x), np.inf)
+            np.minimum.at(first, i[valid], t[valid])
+            earliest = valid & (t == first[i])
+            on_x, on_y = earliest & (tx > ty), earliest & ~(tx > ty)
+
+            contact_x = np.where(dx > 0, np.inf, -np.inf)
+            contact_y = np.where(dy > 0, np.inf, -np.inf)
+            np.minimum.at(contact_x, i[on_x & (dx[i] > 0)], (wx - w[i])[on_x & (dx[i] > 0)])
+            np.maximum.at(contact_x, i[on_x & (dx[i] < 0)], (wx + ww)[on_x & (dx[i] < 0)])
+            np.minimum.at(contact_y, i[on_y & (dy[i] > 0)], (wy - h[i])[on_y & (dy[i] > 0)])
+            np.maximum.at(contact_y, i[on_y & (dy[i] < 0)], (wy + wh)[on_y & (dy[i] < 0)])
+            hit_x, hit_y = np.zeros(len(x), dtype=bool), np.zeros(len(x), dtype=bool)
+            hit_x[i[on_x]] = True
+            hit_y[i[on_y]] = True
+
+            # Boxes that hit nothing finish their move.
+            first[~np.isfinite(first)] = 1.0
+            x, dx = np.where(hit_x, contact_x, x + dx * first), np.where(hit_x, 0.0, dx * (1 - first))
+            y, dy = np.where(hit_y, contact_y, y + dy * first), np.where(hit_y, 0.0, dy * (1 - first))
+
+            # Only the boxes that hit something have some of their move left.
+            left = (dx[i] != 0) | (dy[i] != 0)
+            i, wx, wy, ww, wh = i[left], wx[left], wy[left], ww[left], wh[left]
+        return x + dx, y + dy
+
+    def resolve(self, p, q, size_p, size_q, move, axis):
+        """
+        Push rectangles that moved along the axis (0 for x, 1 for y) out of the walls they now overlap.
+        p is the coordinate along the axis of movement, q the other one. This discrete check is what step did before
+        sweep: a step longer than a wall is thick can end past the wall.
+        """
+        if not len(self.rects):
+            return p
+        moved = np.flatnonzero(move)
+        if axis == 0:
+            i, j = self.candidates(p[moved], q[moved], size_p[moved], size_q[moved])
+        else:
+            i, j = self.candidates(q[moved], p[moved], size_q[moved], size_p[moved])
+        i = moved[i]
+
+        walls = self.rects[j]
+        wp, wq = walls[:, axis], walls[:, 1 - axis]
+        wsize_p, wsize_q = walls[:, 2 + axis], walls[:, 3 - axis]
+        hit = ((p[i] < wp + wsize_p) & (p[i] + size_p[i] > wp) &
+               (q[i] + size_q[i] > wq) & (q[i] < wq + wsize_q))
+
+        # Snap against the nearest wall hit, so the result doesn't depend on wall order.
+        forward = np.full(len(p), np.inf)
+        backward = np.full(len(p), -np.inf)
+        ahead = hit & (move[i] > 0)
+        behind = hit & (move[i] < 0)
+        np.minimum.at(forward, i[ahead], wp[ahead])
+        np.maximum.at(backward, i[behind], (wp + wsize_p)[behind])
+
+        p = np.where(np.isfinite(forward), forward - size_p, p)
+        p = np.where(np.isfinite(backward), backward, p)
+        return p
+
+
+def _array_field(name: str):
+    def fget(self):
+        return float(getattr(self.store, name)[self.slot])
+
+    def fset(self, value):
+        getattr(self.store, name)[self.slot] = value
+
+    return property(fget, fset)
+
+
+def _walking_field(direction: int):
+    def fget(self):
+        return bool(self.store.walking[self.slot, direction])
+
+    def fset(self, value):
+        self.store.walking[self.slot, direction] = value
+
+    return property(fget, fset)
+
+
+class StoredEntity(entity.Entity):
+    x = _array_field('x')
+    y = _array_field('y')
+    w = _array_field('w')
+    h = _array_field('h')
+    last_x = _array_field('last_x')
+    last_y = _array_field('last_y')
+
+    def __init__(self, store: EntityStore, parent: 'room.Room', x: float, y: float, w: float, h: float,
+                 texture_region=None):
+        self.store = store
+        self.slot = store.allocate(self)
+        super().__init__(parent, x, y, w, h, texture_region)
+
+    def release(self):
+        # Out of the room first: once the slot is reused, x and y read another entity's.
+        self.unregister()
+        self.store.release(self.slot)
+
+
+class StoredCreature(StoredEntity, creature.Creature):
+    walking_n = _walking_field(0)
+    walking_e = _walking_field(1)
+    walking_s = _walking_field(2)
+    walking_w = _walking_field(3)
+    walking_speed = _array_field('walking_speed')
+
+    def register(self):
+        # Movement is stepped by the store in bulk, so this doesn't go into room.to_update.
+        entity.Entity.register(self)
+        self.store.moving[self.slot] = True
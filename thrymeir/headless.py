@@ -0,0 +1,114 @@
+"""
+Headless simulation: a Level and its Room built and updated without a window or GL context.
+
+HeadlessApp stands in for App with the same attributes the game state uses, but with stub textures in place of the
+spritesheets, so nothing touches GL until something is drawn (which headless runs never do).
+"""
+import random
+from typing import *
+
+import pyglet
+pyglet.options['shadow_window'] = False
+from pyglet import gl
+from pyglet.window import key
+
+import level  # Imported before app, for the sake of their import cycle.
+import app
+import creature
+import entity_store
+import rectangular_logic
+import room
+import states
+import timestep
+
+__all__ = ['HeadlessApp', 'Wanderer', 'build_level', 'spawn_creatures']
+
+
+def stub_texture(width: int, height: int) -> pyglet.image.Texture:
+    # A texture object that was never created in GL: enough for texture regions and sprites that are never drawn.
+    return pyglet.image.Texture(width, height, gl.GL_TEXTURE_2D, 0)
+
+
+class HeadlessApp:
+    tps = app.App.tps
+
+    def __init__(self):
+        self.scene_width, self.scene_height = 256, 256
+        self.key_state = key.KeyStateHandler()
+
+        pyglet.resource.path = ['res/img', 'res/lvl']
+        pyglet.resource.reindex()
+
+        self.entities_image = stub_texture(256, 256)
+        self.tileset_image = stub_texture(256, 256)
+
+        self.timestep = timestep.FixedTimestep(self.tps, self.on_update)
+        self.state_manager = None
+        self.scripts: List[Callable[[], None]] = []  # Run before every tick, e.g. to drive input.
+
+    def on_update(self, dt):
+        for script in self.scripts:
+            script()
+        self.state_manager.update()
+
+
+class Wanderer:
+    """Scripted input: every few ticks, each creature (and the player's keys) pick a new random direction."""
+
+    def __init__(self, creatures: List['creature.Creature'], key_state: Optional[key.KeyStateHandler] = None,
+                 period: int = 30, seed: int = 0):
+        self.creatures = creatures
+        self.key_state = key_state
+        self.period = period
+        self.rng = random.Random(seed)
+        self.ticks = 0
+
+    def update(self):
+        if self.ticks % self.period == 0:
+            for c in self.creatures:
+                c.walking_n, c.walking_e, c.walking_s, c.walking_w = (self.rng.random() < 0.5 for _ in range(4))
+            if self.key_state is not None:
+                for symbol in (key.UP, key.RIGHT, key.DOWN, key.LEFT):
+                    self.key_state[symbol] = self.rng.random() < 0.5
+        self.ticks += 1
+
+
+def spawn_creatures(r: 'room.Room', count: int, stored: bool = False, seed: int = 0) -> List['creature.Creature']:
+    """Spawn count creatures on random floor tiles of the room that aren't covered by walls."""
+    rng = random.Random(seed)
+    tiled_map = r.tiled_map
+    tw, th = tiled_map.tilewidth, tiled_map.tileheight
+    map_height = tiled_map.height * th
+    floor = tiled_map.get_layer_by_name('floor').data
+
+    spots = []
+    for row, gids in enumerate(floor):
+        for col, gid in enumerate(gids):
+            x, y = col * tw, map_height - (row + 1) * th
+            if gid and not any(rectangular_logic.is_collision(x, y, tw, th, w.x, w.y, w.w, w.h)
+                               for w in r.walls_near(x, y, tw, th)):
+                spots.append((x, y))
+
+    if stored and r.entity_store is None:
+        r.entity_store = entity_store.EntityStore(r)
+    region = r.player.texture_region
+    creatures = []
+    for _ in range(count):
+        x, y = rng.choice(spots)
+        if stored:
+            creatures.append(entity_store.StoredCreature(r.entity_store, r, x, y, 16, 16, region))
+        else:
+            creatures.append(creature.Creature(r, x, y, 16, 16, region))
+    return creatures
+
+
+def build_level(creature_count: int = 0, stored: bool = False,
+                seed: int = 0) -> Tuple[HeadlessApp, 'level.Level', Wanderer]:
+    """A headless app running a level with creature_count creatures, all wandering along with the player."""
+    a = HeadlessApp()
+    lvl = level.Level(a)
+    a.state_manager = states.StateManager(lvl)
+
+    wanderer = Wanderer(spawn_creatures(lvl.room, creature_count, stored, seed), a.key_state, seed=seed)
+    a.scripts.append(wanderer.update)
+    return a, lvl, wanderer
@@ -3,6 +3,8 @@ import contextlib
 import pyglet
 from pyglet import gl
 
+import profiling
+
 __all__ = ['LetterboxViewport']
 
 
@@ -10,7 +12,12 @@ class LetterboxViewport:
     # Some GL-specific code is commented out.
     # This means that for now everything works without it, but it may be needed if something breaks.
 
-    def __init__(self, window: pyglet.window.Window, scene_width: int, scene_height: int, smooth_scaling: bool = False):
+    # The scene is drawn straight into the texture through a framebuffer object, then scaled onto the window as a single
+    # quad. Without framebuffer objects (before GL 3.0 and without the ARB extension), the scene is drawn into the
+    # window's back buffer and copied into the texture instead.
+
+    def __init__(self, window: pyglet.window.Window, scene_width: int, scene_height: int, smooth_scaling: bool = False,
+                 use_fbo: bool = None):
         self.window = window
         self.scene_width = scene_width
         self.scene_height = scene_height
@@ -25,21 +32,48 @@ class LetterboxViewport:
         # glClearColor(0, 0, 0, 1)
         # glMatrixMode(GL_PROJECTION)
 
+        if use_fbo is None:
+            use_fbo = gl.gl_info.have_version(3, 0) or gl.gl_info.have_extension('GL_ARB_framebuffer_object')
+        self.framebuffer = self._create_framebuffer() if use_fbo else None
+
         self.texture_x = self.texture_y = self.scale_width = self.scale_height = 0
+        self.quad = pyglet.graphics.vertex_list(4, 'v2f', ('t3f/static', self.texture.tex_coords))
 
         @window.event
         def on_resize(w, h):
             self.on_window_resize()
         self.on_window_resize()
 
+    def _create_framebuffer(self) -> gl.GLuint:
+        framebuffer = gl.GLuint()
+        gl.glGenFramebuffers(1, framebuffer)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, framebuffer)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0,
+                                  self.texture.target, self.texture.id, 0)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            gl.glDeleteFramebuffers(1, framebuffer)
+            raise RuntimeError(f"Scene framebuffer is incomplete (status {status:#x})")
+        return framebuffer
+
     def begin_drawing(self) -> None:
+        if self.framebuffer is not None:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
         gl.glViewport(0, 0, self.scene_width, self.scene_height)
         self.set_fixed_projection()
         gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
     def end_drawing(self) -> None:
-        buffer = pyglet.image.get_buffer_manager().get_color_buffer()
-        self.texture.blit_into(buffer, 0, 0, 0)
+        with profiling.scope('letterbox blit'):
+            self._blit()
+
+    def _blit(self) -> None:
+        if self.framebuffer is not None:
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        else:
+            buffer = pyglet.image.get_buffer_manager().get_color_buffer()
+            self.texture.blit_into(buffer, 0, 0, 0)
 
         gl.glViewport(0, 0, self.window.width, self.window.height)
         self.set_window_projection()
@@ -47,8 +81,10 @@ class LetterboxViewport:
         gl.glClear(gl.GL_COLOR_BUFFER_BIT)
         # glColor3f(1, 1, 1)
 
-        self.texture.blit(self.texture_x, self.texture_y, width=self.scale_width, height=self.scale_height)
-        self.on_window_resize()
+        gl.glEnable(self.texture.target)
+        gl.glBindTexture(self.texture.target, self.texture.id)
+        self.quad.draw(gl.GL_QUADS)
+        gl.glDisable(self.texture.target)
 
     @contextlib.contextmanager
     def draw(self):
@@ -77,3 +113,7 @@ class LetterboxViewport:
 
         self.texture_x = (self.window.width - self.scale_width) / 2
         self.texture_y = (self.window.height - self.scale_height) / 2
+
+        x1, y1 = self.texture_x, self.texture_y
+        x2, y2 = x1 + self.scale_width, y1 + self.scale_height
+        self.quad.vertices[:] = (x1, y1, x2, y1, x2, y2, x1, y2)
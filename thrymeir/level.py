@@ -2,8 +2,11 @@ import logging
 
 import pyglet
 
+import creature
 import debug_draw
+import profiling
 import room
+import room_manager
 import states
 import app
 
@@ -14,14 +17,50 @@ class Level(states.State):
     def __init__(self, parent: app.App):
         self.app = parent
 
-        # TODO: there will be many, dynamically loaded rooms.
-        self.test_room = room.Room(self)
+        self.rooms = room_manager.RoomManager(self, 'demo.tmx')
+
+        spawn = self.room.spawn_point
+        if spawn is None:
+            raise ValueError(f"Room {self.room.name} has no player-spawn object")
+        self.player = creature.Player(self.room, *spawn, 16, 16,
+                                      pyglet.image.TextureRegion(0, 0, 0, 16, 32, self.app.entities_image))
 
         logger.info(f"New level created: {self}")
 
+    @property
+    def room(self) -> 'room.Room':
+        return self.rooms.current
+
+    def change_room(self, name: str) -> 'room.Room':
+        return self.rooms.enter(name)
+
+    def follow_player(self):
+        """Take the player into the neighbouring room past the edge of the room it walked out of."""
+        p, old = self.player, self.room
+        x, y = p.x + p.w / 2, p.y + p.h / 2
+        direction = 'east' if x >= old.width else 'west' if x < 0 else 'north' if y >= old.height else \
+            'south' if y < 0 else None
+        name = old.data.neighbours.get(direction)
+        # Only once the neighbour is built, which poll() does as soon as it has loaded, so that this never waits.
+        # Until then, or if the room has no neighbour there, the player just walks on.
+        if name is None or name not in self.rooms.resident:
+            return
+        new = self.change_room(name)
+        dx = {'east': -old.width, 'west': new.width}.get(direction, 0)
+        dy = {'north': -old.height, 'south': new.height}.get(direction, 0)
+        p.enter_room(new, p.x + dx, p.y + dy)
+
     def update(self):
-        self.test_room.update()
+        with profiling.scope('room loading'):
+            self.rooms.poll()
+        self.room.update()
+        self.follow_player()
+
+    def close(self):
+        self.rooms.close()
 
-    def draw(self):
+    def draw(self, alpha: float = 1.0):
         debug_draw.draw_cross(0, 0, 256, 256)
-        self.test_room.draw()
+        with profiling.scope('room upload'):
+            self.rooms.upload()
+        self.room.draw(alpha)
@@ -1,4 +1,21 @@
+import pyglet
+from pyglet import gl
+
+import app
 from states import State
 
 class MainMenu(State):
-    pass
\ No newline at end of file
+    # For now only a loading bar, shown while the level loads. Drawn without fonts, which take longer to load than the
+    # rest of the first frame.
+    bar_width, bar_height = 128, 4
+
+    def __init__(self, parent: 'app.App'):
+        self.app = parent
+
+    def draw(self, alpha: float = 1.0):
+        w, h = self.bar_width, self.bar_height
+        x, y = (self.app.scene_width - w) // 2, (self.app.scene_height - h) // 2
+        filled = int(w * self.app.loading_progress)
+        gl.glColor4f(1, 1, 1, 1)
+        pyglet.graphics.draw(4, gl.GL_LINE_LOOP, ('v2i', (x, y, x + w, y, x + w, y + h, x, y + h)))
+        pyglet.graphics.draw(4, gl.GL_QUADS, ('v2i', (x, y, x + filled, y, x + filled, y + h, x, y + h)))
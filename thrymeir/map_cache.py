@@ -0,0 +1,229 @@
+"""
+Compiled Tiled maps, so that rooms load without parsing XML and CSV.
+
+A map and its tilesets are compiled once into a binary file under res/cache: a JSON header with the map's properties,
+tile source rectangles, objects and layer offsets, followed by a uint16 GID array per tile layer and the merged wall
+colliders as int32 rectangles. The file is memory-mapped and the arrays are views of the mapping, so loading copies
+nothing but the header. The cache is keyed by the hashes of the map and tileset files and recompiled when they change.
+
+CompiledMap has the parts of pytmx.TiledMap's interface the game uses, so it can stand in for one. GIDs are pytmx's,
+which number the tiles the map uses from 1. Only plain values (strings, numbers and booleans) of properties are kept.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import *
+
+import numpy as np
+import pyglet
+import pytmx
+
+import colliders
+
+__all__ = ['MapObject', 'CompiledTileLayer', 'CompiledMap', 'compile_map', 'load_map']
+
+
+logger = logging.getLogger(__name__)
+
+magic = b'THRYMAP\0'
+cache_version = 1
+cache_suffix = '.map'
+alignment = 16
+
+_header = struct.Struct('<8sI')
+_tileset_source = re.compile(rb'<tileset\b[^>]*\bsource="([^"]+)"')
+
+
+def _plain(properties: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    return {k: v for k, v in (properties or {}).items() if isinstance(v, (str, int, float, bool))}
+
+
+def _aligned(n: int) -> int:
+    return -(-n // alignment) * alignment
+
+
+class MapObject:
+    __slots__ = ('name', 'type', 'x', 'y', 'width', 'height', 'properties')
+
+    def __init__(self, name: Optional[str], type: Optional[str], x: float, y: float, width: float, height: float,
+                 properties: Dict[str, Any]):
+        self.name, self.type = name, type
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.properties = properties
+
+    def __repr__(self):
+        return f'MapObject({self.name!r})'
+
+
+class CompiledTileLayer:
+    def __init__(self, name: str, visible: bool, properties: Dict[str, Any], data: np.ndarray):
+        self.name = name
+        self.visible = visible
+        self.properties = properties
+        self.data = data  # GIDs, indexed [row][col] with rows going down from the top of the map like Tiled's.
+        self.height, self.width = data.shape
+
+    def iter_data(self) -> Iterator[Tuple[int, int, int]]:
+        """Column, row and GID of every non-empty cell, unlike pytmx which gives the empty ones too."""
+        rows, cols = np.nonzero(self.data)
+        return zip(cols.tolist(), rows.tolist(), self.data[rows, cols].tolist())
+
+
+class CompiledMap:
+    """A compiled map read from a buffer, usually a read-only memory map of the cache file."""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self.buffer = buffer
+        tag, size = _header.unpack_from(buffer)
+        if tag != magic:
+            raise ValueError("Not a compiled map")
+        header = json.loads(bytes(buffer[_header.size:_header.size + size]))
+        data_start = _aligned(_header.size + size)
+
+        self.key: str = header['key']
+        self.width, self.height = header['width'], header['height']
+        self.tilewidth, self.tileheight = header['tilewidth'], header['tileheight']
+        self.properties: Dict[str, Any] = header['properties']
+        # (source image, (x, y, w, h) in it measured from the top, flags) by GID, like pytmx's default image loader.
+        self.images = [None if rect is None else (header['image'], tuple(rect), None) for rect in header['tiles']]
+        self.tile_properties: Dict[int, Dict[str, Any]] = {
+            int(gid): properties for gid, properties in header['tile_properties'].items()
+        }
+        self.objects = [MapObject(**o) for o in header['objects']]
+        self.layers = [
+            CompiledTileLayer(layer['name'], layer['visible'], layer['properties'],
+                              np.frombuffer(buffer, '<u2', self.width * self.height,
+                                            data_start + layer['offset']).reshape(self.height, self.width))
+            for layer in header['layers']
+        ]
+        count = header['colliders']['count']
+        self.colliders = np.frombuffer(buffer, '<i4', count * 4,
+                                       data_start + header['colliders']['offset']).reshape(count, 4)
+
+    @classmethod
+    def open(cls, path: str) -> 'CompiledMap':
+        with open(path, 'rb') as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @property
+    def visible_tile_layers(self) -> Iterator[int]:
+        return (i for i, layer in enumerate(self.layers) if layer.visible)
+
+    @property
+    def wall_rects(self) -> List['colliders.Rect']:
+        return [tuple(rect) for rect in self.colliders.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer)
+
+    def get_layer_by_name(self, name: str) -> CompiledTileLayer:
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise ValueError(f"Layer {name} not found")
+
+    def get_object_by_name(self, name: str) -> MapObject:
+        for o in self.objects:
+            if o.name == name:
+                return o
+        raise ValueError(f"Object {name} not found")
+
+    def get_tile_properties_by_gid(self, gid: int) -> Optional[Dict[str, Any]]:
+        return self.tile_properties.get(gid)
+
+
+def compile_map(path: str, key: str = '', wall_layer: str = 'walls') -> bytes:
+    """The compiled form of the map at path, parsed with pytmx."""
+    tiled_map = pytmx.TiledMap(path)
+
+    arrays, offset, layers = [], 0, []
+    for layer in tiled_map.layers:
+        if not isinstance(layer, pytmx.TiledTileLayer):
+            continue
+        data = np.array(layer.data, dtype=np.int64)
+        if data.max(initial=0) > 0xffff:
+            raise ValueError(f"Layer {layer.name} of {path} uses more tiles than fit in 16 bit GIDs")
+        arrays.append((offset, data.astype('<u2').tobytes()))
+        layers.append({'name': layer.name, 'visible': bool(layer.visible), 'properties': _plain(layer.properties),
+                       'offset': offset})
+        offset = _aligned(offset + len(arrays[-1][1]))
+    try:
+        rects = colliders.wall_rects(tiled_map, wall_layer)
+    except ValueError:
+        rects = []
+    arrays.append((offset, np.array(rects, dtype='<i4').reshape(-1, 4).tobytes()))
+
+    images = [image for image in tiled_map.images if image]
+    header = json.dumps({
+        'key': key,
+        'width': tiled_map.width, 'height': tiled_map.height,
+        'tilewidth': tiled_map.tilewidth, 'tileheight': tiled_map.tileheight,
+        'properties': _plain(tiled_map.properties),
+        'image': images[0][0] if images else None,
+        'tiles': [list(image[1]) if image else None for image in tiled_map.images],
+        'tile_properties': {gid: _plain(tiled_map.get_tile_properties_by_gid(gid))
+                            for gid in range(1, len(tiled_map.images))
+                            if tiled_map.get_tile_properties_by_gid(gid)},
+        'objects': [{'name': o.name, 'type': o.type, 'x': o.x, 'y': o.y, 'width': o.width, 'height': o.height,
+                     'properties': _plain(o.properties)} for o in tiled_map.objects],
+        'layers': layers,
+        'colliders': {'offset': offset, 'count': len(rects)},
+    }).encode()
+
+    data_start = _aligned(_header.size + len(header))
+    out = bytearray(data_start + offset + len(arrays[-1][1]))
+    _header.pack_into(out, 0, magic, len(header))
+    out[_header.size:_header.size + len(header)] = header
+    for array_offset, array in arrays:
+        out[data_start + array_offset:data_start + array_offset + len(array)] = array
+    return bytes(out)
+
+
+def _cache_key(path: str) -> str:
+    # The map and the external tilesets it refers to, which is where the tiles' rectangles come from.
+    with open(path, 'rb') as file:
+        source = file.read()
+    digest = hashlib.sha256(f"{cache_version}".encode())
+    digest.update(hashlib.sha256(source).digest())
+    for tileset in _tileset_source.findall(source):
+        tileset_path = os.path.join(os.path.dirname(path), tileset.decode())
+        digest.update(tileset)
+        with open(tileset_path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def load_map(path: str, cache_dir: Optional[str] = None) -> CompiledMap:
+    """The map at path, from its compiled file if that is up to date, compiled from the sources otherwise."""
+    if cache_dir is None:
+        cache_dir = os.path.join(pyglet.resource.get_script_home(), 'res', 'cache')
+    cache_path = os.path.join(cache_dir, os.path.basename(path) + cache_suffix)
+    key = _cache_key(path)
+
+    try:
+        compiled = CompiledMap.open(cache_path)
+        if compiled.key == key:
+            logger.info(f"Mapped compiled map {cache_path}")
+            return compiled
+    except (OSError, ValueError, KeyError, struct.error):
+        pass
+
+    data = compile_map(path, key)
+    logger.info(f"Compiled map {path} ({len(data) / 1024:.0f} KiB)")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written aside and moved into place, so that other loaders never map a half-written file.
+        temp_path = f'{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, cache_path)
+        return CompiledMap.open(cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write compiled map {cache_path}: {e}")
+    return CompiledMap(data)
@@ -0,0 +1,184 @@
+"""
+Frame profiler: scoped timers around the phases of a frame (update, collision, sort, draw, letterbox blit...), kept in
+a ring buffer, summarised on an overlay with frame time percentiles, and exported as Chrome trace events (load the file
+in chrome://tracing or ui.perfetto.dev).
+
+The game is instrumented through the module-level profiler, so the scopes don't need an app to reach it:
+
+    with profiling.scope('sort'):
+        ...
+
+While the profiler is disabled, scope() returns a shared do-nothing context manager, which costs about as much as an
+empty with block.
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import *
+
+import pyglet
+from pyglet import gl
+
+__all__ = ['FrameProfiler', 'ProfilerOverlay', 'profiler', 'scope']
+
+
+logger = logging.getLogger(__name__)
+
+_disabled = contextlib.nullcontext()
+
+# (name, start, end, thread), times from time.perf_counter().
+Record = Tuple[str, float, float, int]
+
+
+class _Scope:
+    __slots__ = ('records', 'name', 'start')
+
+    def __init__(self, records: Deque[Record], name: str):
+        self.records = records
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.records.append((self.name, self.start, time.perf_counter(), threading.get_ident()))
+
+
+class FrameProfiler:
+    """Records scopes and frame times into ring buffers holding about the last capacity frames."""
+
+    def __init__(self, capacity: int = 600, records_per_frame: int = 32):
+        self.enabled = False
+        self.capacity = capacity
+        self.records: Deque[Record] = collections.deque(maxlen=capacity * records_per_frame)
+        self.frames: Deque[Tuple[float, float]] = collections.deque(maxlen=capacity)  # (start, end) of whole frames.
+        self.frame_start: Optional[float] = None
+        self.main_thread = threading.get_ident()
+
+    def enable(self, enabled: bool = True) -> None:
+        if enabled != self.enabled:
+            self.clear()
+        self.enabled = enabled
+
+    def clear(self) -> None:
+        self.records.clear()
+        self.frames.clear()
+        self.frame_start = None
+
+    def scope(self, name: str) -> ContextManager:
+        return _Scope(self.records, name) if self.enabled else _disabled
+
+    def begin_frame(self) -> None:
+        """Mark the start of a frame, which is the end of the previous one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frames.append((self.frame_start, now))
+        self.frame_start = now
+
+    def frame_times(self) -> List[float]:
+        return [end - start for start, end in self.frames]
+
+    def percentiles(self, *ps: float) -> List[float]:
+        """Frame times at the given percentiles (nearest rank) over the recorded frames, in seconds."""
+        times = sorted(self.frame_times())
+        if not times:
+            return [0.0] * len(ps)
+        return [times[min(len(times) - 1, max(0, round(p / 100 * len(times)) - 1))] for p in ps]
+
+    def phase_times(self, frames: Optional[int] = None) -> Dict[str, Tuple[float, float]]:
+        """Mean and maximum time per frame of every scope name over the last frames recorded frames, in seconds."""
+        recent = list(self.frames)[-frames:] if frames else list(self.frames)
+        if not recent:
+            return {}
+        first = recent[0][0]
+        totals: Dict[str, List[float]] = collections.defaultdict(lambda: [0.0] * len(recent))
+        frame = 0
+        # Records are in the order they ended, which follows the frames' order on the main thread. They're copied first
+        # (in one step under the GIL), as other threads, e.g. the loader, may append to them meanwhile.
+        for name, start, end, thread in list(self.records):
+            if start < first or thread != self.main_thread:
+                continue
+            while frame < len(recent) - 1 and start >= recent[frame][1]:
+                frame += 1
+            if start >= recent[-1][1]:
+                break
+            totals[name][frame] += end - start
+        return {name: (sum(per_frame) / len(per_frame), max(per_frame)) for name, per_frame in totals.items()}
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        pid = os.getpid()
+        records = list(self.records)  # A snapshot, as in phase_times.
+        origin = min([start for _, start, _, _ in records] + [start for start, _ in self.frames], default=0.0)
+        events = [{'name': 'frame', 'cat': 'frame', 'ph': 'X', 'pid': pid, 'tid': self.main_thread,
+                   'ts': (start - origin) * 1e6, 'dur': (end - start) * 1e6} for start, end in self.frames]
+        events.extend({'name': name, 'cat': 'scope', 'ph': 'X', 'pid': pid, 'tid': thread,
+                       'ts': (start - origin) * 1e6, 'dur': (end - start) * 1e6}
+                      for name, start, end, thread in records)
+        names = {self.main_thread: 'main'}
+        names.update({t.ident: t.name for t in threading.enumerate() if t.ident != self.main_thread})
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                      for tid, name in names.items())
+        return events
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write the recorded frames and scopes as a Chrome trace-event JSON file."""
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, file)
+        logger.info(f"Wrote {len(self.frames)} frames of trace events to {path}")
+
+
+profiler = FrameProfiler()
+
+
+def scope(name: str) -> ContextManager:
+    """A timer around a phase of the frame, on the module-level profiler."""
+    return _Scope(profiler.records, name) if profiler.enabled else _disabled
+
+
+class ProfilerOverlay:
+    """Text in the window's corner with the frame time percentiles and the time per frame of each phase."""
+
+    refresh_interval = 0.25  # Seconds between updates of the text, which isn't cheap to lay out.
+    frames = 60  # Phase times are averaged over this many frames.
+
+    def __init__(self, window: 'pyglet.window.Window', source: FrameProfiler = profiler):
+        self.window = window
+        self.profiler = source
+        self.label = None  # Created on first draw, so that a font only loads if the overlay is shown.
+        self.refreshed = 0.0
+
+    def text(self) -> str:
+        p50, p95, p99 = (t * 1000 for t in self.profiler.percentiles(50, 95, 99))
+        lines = [f"frame p50 {p50:.2f} p95 {p95:.2f} p99 {p99:.2f} ms", f"{'phase':<16}{'mean':>7}{'max':>7}"]
+        phases = sorted(self.profiler.phase_times(self.frames).items(), key=lambda item: -item[1][0])
+        lines.extend(f"{name:<16}{mean * 1000:>7.2f}{most * 1000:>7.2f}" for name, (mean, most) in phases)
+        return '\n'.join(lines)
+
+    def draw(self) -> None:
+        """Draw in window coordinates, e.g. after the letterbox blit."""
+        if self.label is None:
+            self.label = pyglet.text.Label('', font_name='monospace', font_size=8, color=(255, 255, 0, 255),
+                                           multiline=True, width=400, anchor_y='top')
+        now = time.perf_counter()
+        if now - self.refreshed >= self.refresh_interval:
+            self.label.text = self.text()
+            self.refreshed = now
+        x, y = 4, self.window.height - 4
+        w, h = self.label.content_width, self.label.content_height
+        self.label.x, self.label.y = x, y
+
+        # A translucent backing, so that the text reads over the scene.
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        gl.glColor4f(0, 0, 0, 0.6)
+        x1, y1, x2, y2 = x - 2, y - h - 2, x + w + 2, y + 2
+        pyglet.graphics.draw(4, gl.GL_QUADS, ('v2f', (x1, y1, x2, y1, x2, y2, x1, y2)))
+        gl.glDisable(gl.GL_BLEND)
+        gl.glColor4f(1, 1, 1, 1)
+        self.label.draw()
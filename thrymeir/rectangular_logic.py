@@ -1,5 +1,64 @@
+import math
+from typing import *
 
 
 def is_collision(x1, y1, w1, h1,
                  x2, y2, w2, h2):
-    return x1 < x2 + w2 and x1 + w1 > x2 and y1 + h1 > y2 and y1 < y2 + h2
+    # With & rather than and, this also works elementwise on NumPy arrays of rectangles.
+    return (x1 < x2 + w2) & (x1 + w1 > x2) & (y1 + h1 > y2) & (y1 < y2 + h2)
+
+
+def sweep(x: float, y: float, w: float, h: float, dx: float, dy: float, walls: Collection) -> Tuple[float, float]:
+    """
+    Where a w by h box at x, y ends after moving by dx, dy through walls (anything with x, y, w, h).
+    The box is swept continuously, so it stops at the earliest wall it would hit even if that is thinner than the step,
+    and then slides along it for the rest of the step. Walls it already overlaps don't stop it, so it can walk out.
+    The earliest hit and the axes it blocks are a minimum and a union over the walls, which doesn't depend on their
+    order. A box hitting a wall's corner exactly slides along x, as when moves were resolved x first.
+    EntityStore's WallGrid.sweep is the same computation for a batch of boxes.
+    """
+    if not walls:
+        return x + dx, y + dy
+    # Only walls overlapping the rectangle swept by the whole move can be hit.
+    x1, y1, x2, y2 = min(x, x + dx), min(y, y + dy), max(x, x + dx) + w, max(y, y + dy) + h
+    walls = [wall for wall in walls if wall.x < x2 and wall.x + wall.w > x1 and wall.y < y2 and wall.y + wall.h > y1]
+
+    for _ in range(2):  # Every hit blocks an axis.
+        first = math.inf
+        hit_x = hit_y = False
+        contact_x = contact_y = 0.0
+        for wall in walls:
+            wx, wy, ww, wh = wall.x, wall.y, wall.w, wall.h
+            # Times of entering and leaving the wall's extent on each axis, as fractions of the move.
+            if dx > 0:
+                tx, ex = (wx - x - w) / dx, (wx + ww - x) / dx
+            elif dx < 0:
+                tx, ex = (wx + ww - x) / dx, (wx - x - w) / dx
+            else:
+                tx, ex = (-math.inf if x < wx + ww and x + w > wx else math.inf), math.inf
+            if dy > 0:
+                ty, ey = (wy - y - h) / dy, (wy + wh - y) / dy
+            elif dy < 0:
+                ty, ey = (wy + wh - y) / dy, (wy - y - h) / dy
+            else:
+                ty, ey = (-math.inf if y < wy + wh and y + h > wy else math.inf), math.inf
+
+            t = max(tx, ty)
+            if not 0 <= t <= 1 or t >= min(ex, ey) or t > first:
+                continue
+            if t < first:
+                first, hit_x, hit_y = t, False, False
+                contact_x, contact_y = (math.inf if dx > 0 else -math.inf), (math.inf if dy > 0 else -math.inf)
+            # The axis entered last is the face that was hit.
+            if tx > ty:
+                hit_x = True
+                contact_x = min(contact_x, wx - w) if dx > 0 else max(contact_x, wx + ww)
+            else:
+                hit_y = True
+                contact_y = min(contact_y, wy - h) if dy > 0 else max(contact_y, wy + wh)
+
+        if first == math.inf:
+            break
+        x, dx = (contact_x, 0.0) if hit_x else (x + dx * first, dx * (1 - first))
+        y, dy = (contact_y, 0.0) if hit_y else (y + dy * first, dy * (1 - first))
+    return x + dx, y + dy
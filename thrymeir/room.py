@@ -1,13 +1,16 @@
 import logging
+from typing import *
 
-import pyglet
-import pytmx
-from pytmx.util_pyglet import load_pyglet as pytmx_load_pyglet
-
+import broad_phase
 import creature
 import debug_draw
 import entity
 import level
+import profiling
+import room_data
+import spatial_hash
+import sprite_batch
+import tile_map
 
 
 __all__ = ['Room']
@@ -17,38 +20,108 @@ logger = logging.getLogger(__name__)
 
 
 class Room:
-    def __init__(self, parent: 'level.Level'):
+    cell_size = 16  # Tile size, used as the wall grid cell.
+
+    def __init__(self, parent: 'level.Level', data: 'room_data.RoomData'):
         self.level = parent
 
+        self.data = data
+        self.name = data.name
+        self.tiled_map = data.tiled_map
+        self.width = self.tiled_map.width * self.tiled_map.tilewidth
+        self.height = self.tiled_map.height * self.tiled_map.tileheight
+        self.tile_layers = None  # Uploaded by upload() or on first draw, so rooms can be simulated without GL.
+
         self.walls = set()
+        self.wall_grid = spatial_hash.SpatialHash(self.cell_size)
         self.half_walls = set()
 
         self.to_update = set()
         self.to_draw = set()
+        self.sprites = sprite_batch.DepthSortedBatch()
 
         self.to_keep = set()  # If entity isn't in any other set, it is here to hide from garbage collector.
 
-        # TODO: This, along with all other things, will be loaded from Tiled map file.
-        self.player = creature.Player(self, 100, 100, 16, 16,
-                                      pyglet.image.TextureRegion(0, 0, 0, 16, 32, self.level.app.entities_image))
-        self.walls.add(entity.Entity(self, 0, 0, 256, 16))
-        self.walls.add(entity.Entity(self, 0, 0, 16, 256))
-        self.walls.add(entity.Entity(self, 256 - 16, 0, 16, 256))
-        self.walls.add(entity.Entity(self, 0, 256 - 16, 256, 16))
-        self.walls.add(entity.Entity(self, 50, 50, 40, 30))
+        self.entity_store = None  # Optional array-backed store for crowds, see entity_store.py.
+        self.broad_phase = broad_phase.SweepAndPrune()  # Entities that opted in to overlap events.
 
-    def update(self):
-        for e in self.to_update:
-            e.update()
+        for x, y, w, h in data.wall_rects:
+            self.add_wall(entity.Entity(self, x, y, w, h))
 
-    def draw(self):
-        # TODO: Remove this.
-        for wall in self.walls:
-            debug_draw.draw_entity(wall)
+        # TODO: Other entities will be loaded from the Tiled map file too.
+
+    @property
+    def player(self) -> 'creature.Player':
+        # Spawned once by the level, and moved from room to room.
+        return self.level.player
 
-        # TODO: This will be replaced by state-of-the art insertion-sorted dynamic batch for optimal performance.
-        entities = list(self.to_draw)
-        entities.sort(key=lambda e: e.y)
+    @property
+    def spawn_point(self) -> Optional[Tuple[int, int]]:
+        """Where the player-spawn object of the map is, if it has one."""
+        try:
+            spawn = self.tiled_map.get_object_by_name('player-spawn')
+        except ValueError:
+            return None
+        # Tiled measures object positions from the top of the map.
+        return int(spawn.x), int(self.height - spawn.y)
 
-        for e in entities:
-            e.texture_region.blit(int(e.x), int(e.y))
+    def add_wall(self, wall: 'entity.Entity'):
+        self.walls.add(wall)
+        self.wall_grid.add(wall)
+        if self.entity_store is not None:
+            self.entity_store.invalidate_walls()
+
+    def remove_wall(self, wall: 'entity.Entity'):
+        self.walls.remove(wall)
+        self.wall_grid.remove(wall)
+        if self.entity_store is not None:
+            self.entity_store.invalidate_walls()
+
+    def walls_near(self, x: float, y: float, w: float, h: float) -> set:
+        return self.wall_grid.query(x, y, w, h)
+
+    def update(self):
+        if self.entity_store is not None:
+            with profiling.scope('entity store'):
+                self.entity_store.step()
+        # Mostly moving creatures and resolving their collisions with walls.
+        with profiling.scope('collision'):
+            for e in self.to_update:
+                e.last_x, e.last_y = e.x, e.y
+                e.update()
+        if self.broad_phase or self.broad_phase.pairs:
+            with profiling.scope('overlaps'):
+                self.update_overlaps()
+
+    def update_overlaps(self):
+        bp = self.broad_phase
+        bp.update()
+        for a, b in bp.entered:
+            a.on_overlap_enter(b)
+            b.on_overlap_enter(a)
+        for a, b in bp.stayed:
+            a.on_overlap_stay(b)
+            b.on_overlap_stay(a)
+        for a, b in bp.exited:
+            a.on_overlap_exit(b)
+            b.on_overlap_exit(a)
+
+    def upload(self):
+        if self.tile_layers is None:
+            self.tile_layers = tile_map.TileMapRenderer(self.data.baked_tiles)
+
+    def draw(self, alpha: float = 1.0):
+        app = self.level.app
+        self.upload()
+        with profiling.scope('tiles'):
+            self.tile_layers.draw(0, 0, app.scene_width, app.scene_height)
+
+        # TODO: Remove this.
+        with profiling.scope('debug draw'):
+            for wall in self.walls:
+                debug_draw.draw_entity(wall)
+
+        with profiling.scope('sort'):
+            self.sprites.sync(self.to_draw, alpha)
+        with profiling.scope('sprites'):
+            self.sprites.draw()
@@ -0,0 +1,58 @@
+import logging
+import os
+import sys
+from typing import *
+
+import pyglet
+
+import colliders
+import map_cache
+import tile_map
+
+__all__ = ['RoomData', 'load_room_data', 'map_path']
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoomData:
+    """
+    Everything about a room that can be prepared without the main thread: the compiled map, merged wall colliders and
+    baked tile vertex data. Rooms are built from it on the main thread, which is also where the vertices go to GL.
+    """
+
+    directions = ('north', 'east', 'south', 'west')
+
+    def __init__(self, name: str, path: str, tiled_map: 'map_cache.CompiledMap',
+                 wall_rects: List['colliders.Rect'], baked_tiles: 'tile_map.BakedTileMap'):
+        self.name = name
+        self.path = path
+        self.tiled_map = tiled_map
+        self.wall_rects = wall_rects
+        self.baked_tiles = baked_tiles
+
+    @property
+    def neighbours(self) -> Dict[str, str]:
+        """Map names of adjacent rooms, from the north/east/south/west properties of the map."""
+        properties = self.tiled_map.properties
+        return {d: properties[d] for d in self.directions if properties.get(d)}
+
+    @property
+    def nbytes(self) -> int:
+        """Rough estimate of the memory held by this room's data."""
+        return self.tiled_map.nbytes + self.baked_tiles.nbytes + len(self.wall_rects) * sys.getsizeof((0, 0, 0, 0))
+
+
+def load_room_data(name: str, tileset: pyglet.image.AbstractImage, path: Optional[str] = None) -> RoomData:
+    """Map (compiling it if it isn't yet) and bake the room of the named map. Safe to call from a loader thread."""
+    if path is None:
+        path = map_path(name)
+    tiled_map = map_cache.load_map(path)
+    data = RoomData(name, path, tiled_map, tiled_map.wall_rects, tile_map.BakedTileMap(tiled_map, tileset))
+    logger.info(f"Loaded room data of {name} ({data.nbytes / 1024:.0f} KiB)")
+    return data
+
+
+def map_path(name: str) -> str:
+    # pyglet.resource only looks up its index here, but call it from the main thread all the same.
+    return os.path.join(pyglet.resource.location(name).path, name)
@@ -0,0 +1,139 @@
+import collections
+import concurrent.futures
+import logging
+from typing import *
+
+import pyglet
+
+import level
+import room
+import room_data
+
+__all__ = ['RoomManager']
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoomManager:
+    """
+    Keeps the current room and its neighbours resident.
+
+    When a room is entered, the maps of its neighbours are loaded (parsed, colliders merged, tiles baked) on a background
+    thread. Once ready, their rooms are built on the main thread in poll() and uploaded to GL in upload(), at most one per
+    frame, so walking through a door only waits for loading if the neighbour hasn't been prefetched in time.
+    Data of rooms that are no longer resident stays cached up to the memory budget, least recently used out first.
+    A neighbour whose map is missing or fails to load is logged and left out, as if the map had no such neighbour.
+    """
+
+    def __init__(self, parent: 'level.Level', start: str, memory_budget: int = 32 << 20):
+        self.level = parent
+        self.memory_budget = memory_budget
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='room-loader')
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._cache: 'collections.OrderedDict[str, room_data.RoomData]' = collections.OrderedDict()
+
+        self.unavailable: Set[str] = set()  # Rooms that failed to load.
+
+        self.resident: Dict[str, 'room.Room'] = {}
+        self.current: Optional['room.Room'] = None
+        self.enter(start)
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(data.nbytes for data in self._cache.values())
+
+    def prefetch(self, name: str) -> None:
+        if name in self._cache or name in self._pending or name in self.unavailable:
+            return
+        try:
+            path = room_data.map_path(name)
+        except pyglet.resource.ResourceNotFoundException as e:
+            self._failed(name, e)
+            return
+        self._pending[name] = self._executor.submit(
+            room_data.load_room_data, name, self.level.app.tileset_image, path
+        )
+
+    def _data(self, name: str, wait: bool) -> Optional['room_data.RoomData']:
+        data = self._cache.get(name)
+        if data is None:
+            if name not in self._pending:
+                if not wait:
+                    return None
+                self.prefetch(name)
+                if name not in self._pending:
+                    return None
+            future = self._pending[name]
+            if not future.done():
+                if not wait:
+                    return None
+                if self.current is not None:
+                    logger.warning(f"Waiting for room {name} to load")
+            del self._pending[name]
+            try:
+                data = self._cache[name] = future.result()
+            except Exception as e:
+                self._failed(name, e)
+                return None
+        self._cache.move_to_end(name)
+        return data
+
+    def _failed(self, name: str, error: Exception) -> None:
+        logger.error(f"Could not load room {name}: {error!r}")
+        self.unavailable.add(name)
+
+    def _room(self, name: str, wait: bool) -> Optional['room.Room']:
+        r = self.resident.get(name)
+        if r is None:
+            data = self._data(name, wait)
+            if data is None:
+                return None
+            r = self.resident[name] = room.Room(self.level, data)
+        return r
+
+    def enter(self, name: str) -> 'room.Room':
+        """Make the named room current, prefetch its neighbours and let go of the rooms that aren't."""
+        r = self._room(name, wait=True)
+        if r is None:
+            raise ValueError(f"Room {name} is unavailable")
+        self.current = r
+
+        wanted = {name, *self.current.data.neighbours.values()}
+        for other in list(self.resident):
+            if other not in wanted:
+                del self.resident[other]
+        for neighbour in wanted - {name}:
+            self.prefetch(neighbour)
+
+        self._evict()
+        logger.info(f"Entered room {name}")
+        return self.current
+
+    def poll(self) -> None:
+        """Build the rooms of neighbours that finished loading. Call on the main thread, e.g. every tick."""
+        for name in self.current.data.neighbours.values():
+            if name not in self.resident and name not in self.unavailable:
+                self._room(name, wait=False)
+
+    def upload(self) -> None:
+        """Upload the tiles of one resident room that isn't uploaded yet. Call with the GL context current."""
+        self.current.upload()
+        for r in self.resident.values():
+            if r.tile_layers is None:
+                r.upload()
+                break
+
+    def _evict(self) -> None:
+        total = self.cached_bytes
+        for name in list(self._cache):
+            if total <= self.memory_budget:
+                break
+            if name in self.resident:
+                continue
+            total -= self._cache.pop(name).nbytes
+            logger.info(f"Evicted room data of {name}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
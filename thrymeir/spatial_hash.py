@@ -0,0 +1,66 @@
+import collections
+import math
+from typing import *
+
+__all__ = ['SpatialHash']
+
+
+Cell = Tuple[int, int]
+
+
+class SpatialHash:
+    """
+    Uniform grid over axis-aligned rectangles (anything with x, y, w, h), keyed by cell.
+    An entity is stored in every cell its rectangle touches, so a query only visits the cells of the query rectangle
+    and its cost doesn't depend on how many entities live elsewhere in the room.
+    """
+
+    def __init__(self, cell_size: float = 16):
+        self.cell_size = cell_size
+        self._cells: DefaultDict[Cell, set] = collections.defaultdict(set)
+        self._entity_cells: Dict[Any, List[Cell]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entity_cells)
+
+    def __contains__(self, e) -> bool:
+        return e in self._entity_cells
+
+    def __iter__(self) -> Iterator:
+        return iter(self._entity_cells)
+
+    def cells(self, x: float, y: float, w: float, h: float) -> Iterator[Cell]:
+        cs = self.cell_size
+        c1, r1 = math.floor(x / cs), math.floor(y / cs)
+        c2, r2 = math.floor((x + w) / cs), math.floor((y + h) / cs)
+        for c in range(c1, c2 + 1):
+            for r in range(r1, r2 + 1):
+                yield c, r
+
+    def add(self, e) -> None:
+        if e in self._entity_cells:
+            self.remove(e)
+        cells = list(self.cells(e.x, e.y, e.w, e.h))
+        for cell in cells:
+            self._cells[cell].add(e)
+        self._entity_cells[e] = cells
+
+    def remove(self, e) -> None:
+        for cell in self._entity_cells.pop(e):
+            bucket = self._cells[cell]
+            bucket.discard(e)
+            if not bucket:
+                del self._cells[cell]
+
+    def update(self, e) -> None:
+        # Call after moving or resizing an entity that is already in the grid.
+        self.add(e)
+
+    def query(self, x: float, y: float, w: float, h: float) -> set:
+        found = set()
+        cells = self._cells
+        for cell in self.cells(x, y, w, h):
+            bucket = cells.get(cell)
+            if bucket:
+                found |= bucket
+        return found
@@ -0,0 +1,89 @@
+from typing import *
+
+import pyglet
+
+import entity
+
+__all__ = ['DepthSortedBatch']
+
+
+class DepthSortedBatch:
+    """
+    Persistent sprites for drawable entities, kept in a single batch and drawn back to front by y.
+
+    Sprites are a pool of slots allocated one after another, so their order in the vertex buffer is the draw order.
+    Slot i shows the i-th entity by y: each frame the entity order is fixed up with an insertion sort, which is
+    linear when only a few entities moved, and only slots whose entity, image or position changed are rewritten.
+    A frame is then a single batch.draw().
+
+    Sprites sharing a texture (all of them, with an atlas) keep this order; different textures end up in
+    different sprite groups, which are drawn one after another.
+    """
+
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self._members: Set['entity.Entity'] = set()
+        self._order: List['entity.Entity'] = []
+        self._keys: List[int] = []
+        self._sprites: List[pyglet.sprite.Sprite] = []
+        self._shown: List[Optional[tuple]] = []  # (texture region, x, y) currently in each slot.
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _set_members(self, entities: Set['entity.Entity']) -> None:
+        removed = self._members - entities
+        if removed:
+            kept = [i for i, e in enumerate(self._order) if e not in removed]
+            self._order = [self._order[i] for i in kept]
+            self._keys = [self._keys[i] for i in kept]
+        for e in entities - self._members:
+            # Appended at the end and moved into place by the insertion sort.
+            self._order.append(e)
+            self._keys.append(int(e.y))
+        self._members = set(entities)
+
+        # Grow and shrink the pool only at its end, so the slots stay in buffer order.
+        while len(self._sprites) > len(self._order):
+            self._sprites.pop().delete()
+            self._shown.pop()
+        while len(self._sprites) < len(self._order):
+            region = self._order[len(self._sprites)].texture_region
+            self._sprites.append(pyglet.sprite.Sprite(region, batch=self.batch))
+            self._shown.append(None)
+
+    def sync(self, entities: Set['entity.Entity'], alpha: float = 1.0) -> None:
+        """Update the sprites to show the given entities at their positions interpolated by alpha."""
+        if len(entities) != len(self._members) or not entities >= self._members:
+            self._set_members(entities)
+
+        order, keys = self._order, self._keys
+        xs = [0] * len(order)
+        for i, e in enumerate(order):
+            x, y = e.render_position(alpha)
+            xs[i], keys[i] = int(x), int(y)
+
+        for i in range(1, len(order)):
+            key = keys[i]
+            if keys[i - 1] <= key:
+                continue
+            e, x, j = order[i], xs[i], i - 1
+            while j >= 0 and keys[j] > key:
+                order[j + 1], xs[j + 1], keys[j + 1] = order[j], xs[j], keys[j]
+                j -= 1
+            order[j + 1], xs[j + 1], keys[j + 1] = e, x, key
+
+        shown, sprites = self._shown, self._sprites
+        for i, e in enumerate(order):
+            state = (e.texture_region, xs[i], keys[i])
+            old = shown[i]
+            if old == state:
+                continue
+            sprite = sprites[i]
+            if old is None or old[0] is not state[0]:
+                sprite.image = state[0]
+            sprite.position = state[1], state[2]
+            shown[i] = state
+
+    def draw(self) -> None:
+        self.batch.draw()
@@ -1,3 +1,5 @@
+import profiling
+
 __all__ = ['State', 'StateManager']
 
 
@@ -5,7 +7,8 @@ class State:
     def update(self):
         pass
 
-    def draw(self):
+    def draw(self, alpha: float = 1.0):
+        # alpha is how far the frame is between the previous and the current tick, for interpolation.
         pass
 
 
@@ -23,3 +26,11 @@ class StateManager:
             raise RuntimeError("Operation causes depletion of state stack")
         self.current = self._stack[-2]
         return self._stack.pop()
+
+    def update(self):
+        with profiling.scope('update'):
+            self.current.update()
+
+    def draw(self, alpha: float = 1.0):
+        with profiling.scope('draw'):
+            self.current.draw(alpha)
@@ -0,0 +1,122 @@
+import collections
+import logging
+import math
+from typing import *
+
+import pyglet
+from pyglet import gl
+import pytmx
+
+import tiles
+
+__all__ = ['TileLayerGroup', 'BakedTileMap', 'TileMapRenderer']
+
+
+logger = logging.getLogger(__name__)
+
+
+class TileLayerGroup(pyglet.graphics.TextureGroup):
+    def set_state(self):
+        super().set_state()
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        gl.glDisable(gl.GL_BLEND)
+        super().unset_state()
+
+
+class BakedTileMap:
+    """
+    Vertex data of the visible tile layers of a Tiled map, grouped into square chunks of tiles.
+    Baking doesn't touch GL, so it can run on a loader thread; TileMapRenderer uploads the result.
+
+    All tiles are expected to come from the tileset image passed as texture, and are looked up in a TileRegistry of it.
+    """
+
+    chunk_size = 16  # In tiles.
+
+    def __init__(self, tiled_map: pytmx.TiledMap, texture: pyglet.image.AbstractImage, chunk_size: int = None):
+        self.tiled_map = tiled_map
+        self.texture = texture
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+        self.tile_width, self.tile_height = tiled_map.tilewidth, tiled_map.tileheight
+        self.chunk_width = self.chunk_size * self.tile_width
+        self.chunk_height = self.chunk_size * self.tile_height
+
+        # (layer order, vertices, tex coords) of every layer with tiles in the chunk.
+        self.chunks: DefaultDict[Tuple[int, int], List[Tuple[int, list, list]]] = collections.defaultdict(list)
+        self.layer_count = 0
+        self.tile_count = 0
+        self.tiles = tiles.TileRegistry(tiled_map, texture)
+
+        for order, index in enumerate(tiled_map.visible_tile_layers):
+            self._bake_layer(tiled_map.layers[index], order)
+            self.layer_count += 1
+
+    @property
+    def nbytes(self) -> int:
+        # 2 ints of position and 3 floats of texture coordinates per vertex.
+        return sum(4 * (len(vertices) + len(tex_coords))
+                   for layers in self.chunks.values() for _, vertices, tex_coords in layers)
+
+    def _bake_layer(self, layer: pytmx.TiledTileLayer, order: int) -> None:
+        map_height = self.tiled_map.height * self.tile_height
+        quads = collections.defaultdict(lambda: ([], []))
+
+        for col, row, tile in self.tiles.layer_tiles(layer):
+            w, h = tile.region.width, tile.region.height
+            # Tiles are anchored at the bottom left of their cell, and rows go down from the top of the map.
+            x, y = col * self.tile_width, map_height - (row + 1) * self.tile_height
+            vertices, tex_coords = quads[x // self.chunk_width, y // self.chunk_height]
+            vertices.extend((x, y, x + w, y, x + w, y + h, x, y + h))
+            tex_coords.extend(tile.region.tex_coords)
+            self.tile_count += 1
+
+        for chunk, (vertices, tex_coords) in quads.items():
+            self.chunks[chunk].append((order, vertices, tex_coords))
+
+
+class TileMapRenderer:
+    """
+    Static tile layers of a baked map, uploaded once into vertex lists of a single batch.
+    There is one vertex list per chunk and layer, and only chunks intersecting the view are drawn,
+    so a frame costs a draw call per visible chunk and layer rather than one per tile.
+    """
+
+    def __init__(self, baked: BakedTileMap):
+        self.baked = baked
+        self.chunk_width, self.chunk_height = baked.chunk_width, baked.chunk_height
+
+        self.batch = pyglet.graphics.Batch()
+        self.chunks: DefaultDict[Tuple[int, int], list] = collections.defaultdict(list)
+        self._visible_view = self._visible = None
+
+        groups = [TileLayerGroup(baked.texture, parent=pyglet.graphics.OrderedGroup(order))
+                  for order in range(baked.layer_count)]
+        for chunk, layers in baked.chunks.items():
+            for order, vertices, tex_coords in layers:
+                self.chunks[chunk].append(self.batch.add(
+                    len(vertices) // 2, gl.GL_QUADS, groups[order],
+                    ('v2i/static', vertices), ('t3f/static', tex_coords)
+                ))
+
+        logger.info(f"Uploaded {baked.tile_count} tiles as {sum(map(len, self.chunks.values()))} vertex lists "
+                    f"over {len(self.chunks)} chunks")
+
+    def visible_vertex_lists(self, x: float, y: float, w: float, h: float) -> list:
+        view = (x, y, w, h)
+        if view != self._visible_view:
+            c1, r1 = math.floor(x / self.chunk_width), math.floor(y / self.chunk_height)
+            c2, r2 = math.ceil((x + w) / self.chunk_width), math.ceil((y + h) / self.chunk_height)
+            self._visible = [vertex_list
+                             for c in range(c1, c2) for r in range(r1, r2)
+                             for vertex_list in self.chunks.get((c, r), ())]
+            self._visible_view = view
+        return self._visible
+
+    def draw(self, x: float, y: float, w: float, h: float) -> None:
+        """Draw the chunks intersecting the rectangle in map coordinates."""
+        self.batch.draw_subset(self.visible_vertex_lists(x, y, w, h))
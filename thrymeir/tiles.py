@@ -1,10 +1,61 @@
+"""
+Tiles as flyweights: one Tile per tileset GID, shared by every cell of the map that shows it.
+
+A cell's position is where it is in the layer, so Tile only holds what all cells with the same GID have in common,
+the texture region and the tile's properties, and the registry builds those once per GID on first use.
+"""
+import types
+from typing import *
+
 import pyglet
-import os
-from enum import Enum
+import pytmx
+
+__all__ = ['Tile', 'TileRegistry']
+
+
+no_metadata: Mapping[str, Any] = types.MappingProxyType({})
+
 
 class Tile:
+    __slots__ = ('gid', 'region', 'metadata')
     overdraw = False
-    def __init__(self, col, row, metadata={}):
-        self.col, self.row = col, row
-        self.metadata = metadata
-        self.image = pyglet.resource.image('missing_tile.png')
\ No newline at end of file
+
+    def __init__(self, gid: int, region: pyglet.image.TextureRegion, metadata: Mapping[str, Any] = no_metadata):
+        self.gid = gid
+        self.region = region
+        # Read-only, since it is shared by every cell with this GID.
+        self.metadata = types.MappingProxyType(dict(metadata)) if metadata else no_metadata
+
+    def __repr__(self):
+        return f'Tile({self.gid})'
+
+
+class TileRegistry:
+    """
+    The tiles of a Tiled map by GID, all with regions of the tileset image passed as texture.
+    pytmx is used with its default image loader, which gives the source rectangle of every tile in that image.
+    """
+
+    def __init__(self, tiled_map: pytmx.TiledMap, texture: pyglet.image.AbstractImage):
+        self.tiled_map = tiled_map
+        self.texture = texture
+        self._tiles: Dict[int, Tile] = {}
+
+    def __getitem__(self, gid: int) -> Tile:
+        tile = self._tiles.get(gid)
+        if tile is None:
+            _, (x, y, w, h), _ = self.tiled_map.images[gid]
+            # Tiled measures from the top of the image, pyglet from the bottom.
+            region = self.texture.get_region(x, self.texture.height - y - h, w, h)
+            metadata = self.tiled_map.get_tile_properties_by_gid(gid) or no_metadata
+            tile = self._tiles[gid] = Tile(gid, region, metadata)
+        return tile
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def layer_tiles(self, layer: pytmx.TiledTileLayer) -> Iterator[Tuple[int, int, Tile]]:
+        """Column, row and tile of every non-empty cell of the layer."""
+        for col, row, gid in layer.iter_data():
+            if gid:
+                yield col, row, self[gid]
@@ -0,0 +1,55 @@
+import time
+from typing import *
+
+__all__ = ['FixedTimestep']
+
+
+class FixedTimestep:
+    """
+    Deterministic fixed-step simulation driven by variable frame times.
+    Frame time is accumulated and spent in whole steps of 1/tps, with at most max_steps per frame, so a slow frame can't
+    snowball into ever longer catch-ups (the time that couldn't be caught up on is dropped). What is left in the
+    accumulator gives the interpolation alpha between the previous and the current simulation state.
+    """
+
+    def __init__(self, tps: float, update: Callable[[float], None], max_steps: int = 5):
+        self.step = 1 / tps
+        self.update = update
+        self.max_steps = max_steps
+
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.dropped = 0.0  # Seconds of simulation skipped to avoid the spiral of death.
+
+    @property
+    def time(self) -> float:
+        """Simulated time, in seconds."""
+        return self.ticks * self.step
+
+    @property
+    def alpha(self) -> float:
+        return self.accumulator / self.step
+
+    def advance(self, dt: float) -> float:
+        """Run the steps due after dt seconds of real time and return the interpolation alpha."""
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.step:
+            if steps == self.max_steps:
+                excess = self.accumulator - self.accumulator % self.step
+                self.dropped += excess
+                self.accumulator -= excess
+                break
+            self.update(self.step)
+            self.accumulator -= self.step
+            self.ticks += 1
+            steps += 1
+        return self.alpha
+
+    def run(self, ticks: int) -> float:
+        """Run ticks steps back to back, as fast as possible, and return the wall-clock time it took."""
+        start = time.perf_counter()
+        for _ in range(ticks):
+            self.update(self.step)
+            self.ticks += 1
+        return time.perf_counter() - start